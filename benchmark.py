@@ -0,0 +1,238 @@
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from ledger import AGENT_VALUES, OBJECT_VALUES, RISK_VALUES, HashChainDB, contract_row_values
+
+BENCHMARK_FORMAT = "insurance-ledger-benchmark"
+BENCHMARK_VERSION = 1
+DEFAULT_SIZES = (10000, 100000, 1000000)
+LOOKUP_COUNT = 10000
+APPEND_COUNT = 1000
+VIEWPORT_COUNT = 1000
+VIEWPORT_ROWS = 40
+
+SURNAMES = ['Иванов', 'Смирнов', 'Петров', 'Сидоров', 'Кузнецов', 'Попов', 'Михайлов', 'Алексеев', 'Козлов', 'Новиков']
+MALE_NAMES = ['Александр', 'Андрей', 'Михаил', 'Сергей', 'Дмитрий', 'Иван']
+FEMALE_NAMES = ['Анна', 'Марта', 'Ирина', 'Алеся', 'Елена', 'Ольга']
+PATRONYMICS = ['Петрович', 'Александрович', 'Сергеевич', 'Степанович', 'Иванович']
+PHONE_PREFIXES = ['+37529', '+37533', '+37544', '+37525']
+
+def synthetic_names():
+    names = [f"{surname} {name} {patronymic}"
+             for surname in SURNAMES for name in MALE_NAMES for patronymic in PATRONYMICS]
+    names += [f"{surname}а {name} {patronymic[:-2]}на"
+              for surname in SURNAMES for name in FEMALE_NAMES for patronymic in PATRONYMICS]
+    return names
+
+def generate_contract_rows(count, seed=0, first_number=1):
+    rng = random.Random(seed)
+    names = synthetic_names()
+    first_day = datetime.date(2020, 1, 1)
+    days = [first_day + datetime.timedelta(days=offset) for offset in range(6 * 365)]
+    dates = [day.strftime("%d.%m.%Y") for day in days]
+    timestamps = [day.strftime("%Y-%m-%d 09:00:00") for day in days]
+    for number in range(first_number, first_number + count):
+        start = rng.randrange(len(days) - 3 * 365)
+        end = start + 365 * rng.choice((1, 1, 1, 2, 3))
+        premium = rng.randrange(4, 400) * 5.0
+        fields = (
+            rng.choice(names), f"{number:07d}", f"{rng.choice(PHONE_PREFIXES)}{rng.randrange(10 ** 7):07d}",
+            rng.choice(OBJECT_VALUES), rng.choice(RISK_VALUES), dates[start], dates[end],
+            premium, premium * rng.choice((1, 2, 5, 10, 20)), rng.choice(AGENT_VALUES)
+        )
+        yield fields, timestamps[start]
+
+def add_rows(db, rows):
+    for fields, timestamp in rows:
+        db.add_contract(*fields, timestamp=timestamp)
+
+def generate_ledger(filepath, count, seed=0):
+    db = HashChainDB()
+    add_rows(db, generate_contract_rows(count, seed))
+    db.save_to_filepath(filepath)
+    db.is_chain_valid()
+    db.save_checkpoint(filepath)
+    return db
+
+def measure(run, setup=None, trace_memory=True):
+    peak = None
+    if trace_memory:
+        state = setup() if setup is not None else None
+        tracemalloc.start()
+        try:
+            run(state)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        state = None
+    state = setup() if setup is not None else None
+    started = time.perf_counter()
+    run(state)
+    return time.perf_counter() - started, peak, state
+
+def result_entry(size, operation, count, elapsed, peak, **extra):
+    entry = {
+        "size": size,
+        "operation": operation,
+        "count": count,
+        "seconds": elapsed,
+        "per_op_us": elapsed / count * 1e6 if count else 0.0,
+        "ops_per_second": count / elapsed if elapsed > 0 else 0.0,
+        "peak_memory_bytes": peak,
+    }
+    entry.update(extra)
+    return entry
+
+def benchmark_size(size, seed, workdir, trace_memory=True):
+    results = []
+    rows = list(generate_contract_rows(size, seed))
+
+    elapsed, peak, db = measure(lambda db: add_rows(db, rows), HashChainDB, trace_memory)
+    results.append(result_entry(size, "add_contract", size, elapsed, peak))
+    rows = None
+
+    rng = random.Random(seed)
+    policies = [f"{rng.randrange(1, 2 * size + 1):07d}" for _ in range(LOOKUP_COUNT)]
+
+    def reset_policy_index():
+        db.policy_index = None
+
+    elapsed, peak, _ = measure(lambda state: db.is_policy_number_unique(policies[0]), reset_policy_index, trace_memory)
+    results.append(result_entry(size, "is_policy_number_unique (index build)", 1, elapsed, peak))
+
+    def lookup_policies(state):
+        for policy_number in policies:
+            db.is_policy_number_unique(policy_number)
+
+    elapsed, peak, _ = measure(lookup_policies, None, trace_memory)
+    results.append(result_entry(size, "is_policy_number_unique", LOOKUP_COUNT, elapsed, peak))
+
+    elapsed, peak, _ = measure(lambda state: db.is_chain_valid(full=True), None, trace_memory)
+    results.append(result_entry(size, "is_chain_valid", size, elapsed, peak))
+
+    filepath = os.path.join(workdir, f"ledger-{size}.jsonl")
+
+    def remove_ledger():
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+    elapsed, peak, _ = measure(lambda state: db.save_to_filepath(filepath), remove_ledger, trace_memory)
+    results.append(result_entry(size, "save_to_filepath", size, elapsed, peak,
+                                file_bytes=os.path.getsize(filepath)))
+
+    extra_rows = generate_contract_rows(2 * APPEND_COUNT, seed + 1, first_number=size + 1)
+
+    def add_extra_rows():
+        add_rows(db, (next(extra_rows) for _ in range(APPEND_COUNT)))
+
+    elapsed, peak, _ = measure(lambda state: db.save_to_filepath(filepath), add_extra_rows, trace_memory)
+    results.append(result_entry(size, "save_to_filepath (append)", APPEND_COUNT, elapsed, peak))
+    db.close()
+    db = None
+
+    def load_ledger(loaded):
+        loaded.load_from_filepath(filepath)
+
+    def fresh_db():
+        return HashChainDB()
+
+    elapsed, peak, loaded = measure(load_ledger, fresh_db, trace_memory)
+    results.append(result_entry(size, "load_from_filepath", len(loaded.chain) - 1, elapsed, peak,
+                                storage=type(loaded.chain).__name__))
+
+    offsets = [rng.randrange(max(1, len(loaded.chain) - VIEWPORT_ROWS)) for _ in range(VIEWPORT_COUNT)]
+
+    def build_viewports(state):
+        for offset in offsets:
+            for contract_id in range(offset + 1, min(offset + 1 + VIEWPORT_ROWS, len(loaded.chain))):
+                contract_row_values(contract_id, loaded.chain[contract_id])
+
+    elapsed, peak, _ = measure(build_viewports, None, trace_memory)
+    results.append(result_entry(size, "update_table rows", VIEWPORT_COUNT, elapsed, peak,
+                                rows_per_viewport=VIEWPORT_ROWS))
+    loaded.close()
+    return results
+
+def compare_results(results, baseline):
+    previous = {(entry["size"], entry["operation"]): entry for entry in baseline.get("results", [])}
+    for entry in results:
+        base = previous.get((entry["size"], entry["operation"]))
+        if base is None or not base.get("per_op_us"):
+            continue
+        ratio = entry["per_op_us"] / base["per_op_us"]
+        print(f"  {entry['size']:>8} {entry['operation']:<40} x{ratio:.2f}")
+
+def run_benchmarks(args):
+    results = []
+    workdir = tempfile.mkdtemp(prefix="ledger-bench-", dir=args.workdir)
+    try:
+        for size in args.sizes:
+            print(f"Размер {size}:")
+            for entry in benchmark_size(size, args.seed, workdir, not args.no_memory):
+                peak = entry["peak_memory_bytes"]
+                peak_text = f"{peak / 2 ** 20:9.1f} МБ" if peak is not None else "        —"
+                print(f"  {entry['operation']:<40} {entry['seconds']:9.3f} с {entry['per_op_us']:11.2f} мкс/оп {peak_text}")
+                results.append(entry)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "format": BENCHMARK_FORMAT,
+        "version": BENCHMARK_VERSION,
+        "created": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "memory_traced": not args.no_memory,
+        "results": results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результаты записаны в {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"Сравнение с {args.baseline} (время на операцию, текущее / базовое):")
+        compare_results(results, baseline)
+    return 0
+
+def run_generate(args):
+    started = time.perf_counter()
+    generate_ledger(args.ledger, args.count, args.seed)
+    print(f"Создан реестр {args.ledger}: {args.count} договоров, {time.perf_counter() - started:.1f} с")
+    return 0
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Нагрузочные тесты реестра страховых договоров")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Запустить замеры")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Размеры реестров")
+    run_parser.add_argument("--seed", type=int, default=0, help="Начальное значение генератора")
+    run_parser.add_argument("--output", default="benchmark_results.json", help="JSON-файл с результатами")
+    run_parser.add_argument("--baseline", help="Результаты предыдущего запуска для сравнения")
+    run_parser.add_argument("--no-memory", action="store_true", help="Не замерять пиковую память (tracemalloc)")
+    run_parser.add_argument("--workdir", help="Каталог для временных файлов реестра")
+
+    generate_parser = subparsers.add_parser("generate", help="Создать синтетический реестр")
+    generate_parser.add_argument("ledger", help="Файл реестра")
+    generate_parser.add_argument("--count", type=int, default=DEFAULT_SIZES[0], help="Число договоров")
+    generate_parser.add_argument("--seed", type=int, default=0, help="Начальное значение генератора")
+
+    args = parser.parse_args(argv)
+    commands = {"run": run_benchmarks, "generate": run_generate}
+    return commands[args.command](args)
+
+if __name__ == '__main__':
+    sys.exit(main())
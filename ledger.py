@@ -0,0 +1,1929 @@
+import bisect
+import functools
+import hashlib
+import datetime
+import io
+import json
+import math
+import mmap
+import os
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict, deque
+
+LEDGER_FORMAT = "insurance-ledger"
+LEDGER_VERSION = 2
+
+OBJECT_VALUES = [
+    'Квартира', 'Дом', 'Дача', 'Коммерческая недвижимость', 'Земельный участок',
+    'Автомобиль легковой', 'Автомобиль грузовой', 'Мотоцикл', 'Спецтехника',
+    'Смартфон', 'Ноутбук', 'Телевизор', 'Фотоаппарат', 'Бытовая техника',
+    'Туристическая поездка', 'Авиабилеты', 'Круиз', 'Багаж',
+    'Жизнь и здоровье', 'От несчастных случаев', 'ДМС',
+    'Гражданская ответственность', 'Профессиональная ответственность',
+    'Драгоценности', 'Произведение искусства', 'Антиквариат'
+]
+RISK_VALUES = [
+    'Затопление', 'Пожар', 'Кража со взломом', 'Противоправные действия третьих лиц', 'Стихийное бедствие',
+    'ДТП по своей вине', 'ДТП не по своей вине', 'Угон', 'Хищение',
+    'Механическое повреждение', 'Поломка', 'Производственный брак', 'Гарантийный случай',
+    'Утеря багажа', 'Задержка рейса', 'Отмена поездки', 'Медицинские расходы за рубежом', 'Невыезд',
+    'Травма', 'Инвалидность', 'Временная нетрудоспособность',
+    'Причинение вреда соседям', 'Врачебная ошибка', 'Ошибка юриста'
+]
+AGENT_VALUES = ['Иванов И.И.', 'Петров П.П.', 'Сидорова А.А.', 'Кузнецов М.В.']
+
+IMPORT_FIELDS = ('fio', 'policy_number', 'phone', 'object_insured', 'risk',
+                 'start_date', 'end_date', 'premium', 'coverage', 'agent')
+
+def compute_block_hash(fio, policy_number, phone, object_insured, risk, start_date, end_date,
+                       premium, coverage, agent, timestamp, previous_hash):
+    premium_str = f"{premium:.2f}"
+    coverage_str = f"{coverage:.2f}"
+    block_string = (f"{fio}{policy_number}{phone}"
+                    f"{object_insured}{risk}{start_date}{end_date}"
+                    f"{premium_str}{coverage_str}{agent}{timestamp}"
+                    f"{previous_hash}")
+    METRICS.counters["hashes_computed"] += 1
+    return hashlib.sha256(block_string.encode()).hexdigest()
+
+def find_first_invalid_contract(start_index, previous_hash, contracts):
+    for offset, contract in enumerate(contracts):
+        if contract.previous_hash != previous_hash or contract.current_hash != contract.calculate_hash():
+            return start_index + offset
+        previous_hash = contract.current_hash
+    return None
+
+def iter_json_array(f, chunk_size=1 << 16):
+    decoder = json.JSONDecoder()
+    reader = io.TextIOWrapper(f, encoding='utf-8-sig')
+    buffer = reader.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError("Ожидался JSON-массив")
+    pos = 1
+    eof = False
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == ']':
+            return
+        if pos < len(buffer):
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                if end < len(buffer) or eof:
+                    yield item
+                    pos = end
+                    continue
+            except ValueError:
+                if eof:
+                    raise
+        if eof:
+            raise ValueError("Неожиданный конец JSON-массива")
+        more = reader.read(chunk_size)
+        eof = not more
+        buffer = buffer[pos:] + more
+        pos = 0
+
+class CategoryDictionary:
+    def __init__(self, values=()):
+        self.values = []
+        self.codes = {}
+        for value in values:
+            self.encode(value)
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+    def decode(self, code):
+        return self.values[code]
+
+    def sync(self, values):
+        for value in values[len(self.values):]:
+            self.encode(value)
+
+OBJECT_CATEGORIES = CategoryDictionary(OBJECT_VALUES)
+RISK_CATEGORIES = CategoryDictionary(RISK_VALUES)
+AGENT_CATEGORIES = CategoryDictionary(AGENT_VALUES)
+DATE_CATEGORIES = CategoryDictionary()
+CATEGORY_DICTIONARIES = (OBJECT_CATEGORIES, RISK_CATEGORIES, AGENT_CATEGORIES, DATE_CATEGORIES)
+
+def pack_hash(value):
+    if isinstance(value, str) and len(value) == 64:
+        try:
+            digest = bytes.fromhex(value)
+        except ValueError:
+            return None
+        if digest.hex() == value:
+            return digest
+    return None
+
+def iter_import_rows(filepath):
+    import csv
+
+    with open(filepath, 'r', encoding='utf-8-sig', newline='') as f:
+        if os.path.splitext(filepath)[1].lower() == '.csv':
+            first_line = f.readline()
+            f.seek(0)
+            delimiter = ';' if first_line.count(';') > first_line.count(',') else ','
+            reader = csv.DictReader(f, delimiter=delimiter)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_no, json.loads(line)
+                except ValueError:
+                    yield line_no, None
+
+PROGRESS_INTERVAL = 4096
+
+class OperationCancelled(Exception):
+    pass
+
+def report_progress(progress, cancel, done, total):
+    if cancel is not None and cancel.is_set():
+        raise OperationCancelled()
+    if progress is not None:
+        progress(done, total)
+
+class Histogram:
+    BOUNDS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self):
+        self.bucket_counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(self.BOUNDS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative_buckets(self):
+        total = 0
+        for bound, bucket_count in zip(self.BOUNDS + (float("inf"),), self.bucket_counts):
+            total += bucket_count
+            yield ("+Inf" if bound == float("inf") else repr(bound)), total
+
+class Metrics:
+    PREFIX = "insurance_ledger"
+    COUNTERS = {
+        "hashes_computed": "Число вычисленных хэшей SHA-256",
+        "contracts_loaded": "Число договоров, загруженных из файлов реестра",
+        "contracts_saved": "Число договоров, записанных в файлы реестра",
+        "contracts_added": "Число договоров, добавленных в цепочку",
+    }
+    HISTOGRAMS = {
+        "load": "Длительность загрузки реестра, с",
+        "save": "Длительность сохранения реестра, с",
+        "validation": "Длительность проходов проверки целостности, с",
+        "update_table": "Длительность обновления таблицы, с",
+        "render_rows": "Длительность отрисовки видимых строк таблицы, с",
+    }
+
+    def __init__(self):
+        self.profile_lock = threading.Lock()
+        self.profiler = None
+        self.last_profile = None
+        self.reset()
+
+    def reset(self):
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        self.histograms = {name: Histogram() for name in self.HISTOGRAMS}
+
+    def increment(self, name, amount=1):
+        self.counters[name] += amount
+
+    def observe(self, name, seconds):
+        self.histograms[name].observe(seconds)
+
+    def call(self, name, function, *args, **kwargs):
+        profiler = self.profiler
+        profiling = profiler is not None and self.profile_lock.acquire(blocking=False)
+        if profiling:
+            profiler.enable()
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            self.observe(name, time.perf_counter() - started)
+            if profiling:
+                profiler.disable()
+                self.profile_lock.release()
+
+    def start_profile(self):
+        import cProfile
+
+        if self.profiler is None:
+            self.profiler = cProfile.Profile()
+
+    def stop_profile(self, limit=40):
+        import pstats
+
+        if self.profiler is None:
+            return self.last_profile
+        with self.profile_lock:
+            profiler, self.profiler = self.profiler, None
+        stream = io.StringIO()
+        try:
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(limit)
+        except TypeError:
+            stream.write("Нет данных профилирования\n")
+        self.last_profile = stream.getvalue()
+        return self.last_profile
+
+    @property
+    def is_profiling(self):
+        return self.profiler is not None
+
+    def snapshot(self):
+        return {
+            "counters": dict(self.counters),
+            "histograms": {
+                f"{name}_seconds": {
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "buckets": dict(histogram.cumulative_buckets()),
+                }
+                for name, histogram in self.histograms.items()
+            },
+            "profiling": self.is_profiling,
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        lines = []
+        for name, help_text in self.COUNTERS.items():
+            metric = f"{self.PREFIX}_{name}_total"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {self.counters[name]}")
+        for name, help_text in self.HISTOGRAMS.items():
+            metric = f"{self.PREFIX}_{name}_seconds"
+            histogram = self.histograms[name]
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} histogram")
+            for bound, total in histogram.cumulative_buckets():
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {total}')
+            lines.append(f"{metric}_sum {histogram.sum!r}")
+            lines.append(f"{metric}_count {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, fmt):
+        return self.to_prometheus() if fmt == "prometheus" else self.to_json()
+
+METRICS = Metrics()
+
+def timed(name):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            return METRICS.call(name, function, *args, **kwargs)
+        return wrapper
+    return decorator
+
+def read_ledger_header(f):
+    try:
+        header = json.loads(f.readline())
+    except ValueError:
+        header = None
+    if not isinstance(header, dict) or header.get("format") != LEDGER_FORMAT:
+        raise ValueError("Неизвестный формат файла реестра")
+    if header.get("version", 0) > LEDGER_VERSION:
+        raise ValueError(f"Неподдерживаемая версия формата: {header.get('version')}")
+    return header
+
+def stop_at_torn_tail(f, position):
+    if f.readline():
+        raise ValueError(f"Поврежденная запись по смещению {position}")
+
+def iter_committed_records(f, committed_count, last_hash, on_progress=None):
+    pending_count = 0
+    pending_last_hash = last_hash
+    line_count = 0
+    while True:
+        line_count += 1
+        if on_progress is not None and line_count % PROGRESS_INTERVAL == 0:
+            on_progress(f.tell())
+        position = f.tell()
+        line = f.readline()
+        if not line.endswith(b"\n"):
+            return
+        try:
+            item = json.loads(line)
+        except ValueError:
+            item = None
+        if not isinstance(item, dict):
+            stop_at_torn_tail(f, position)
+            return
+        if "commit" not in item:
+            pending_count += 1
+            pending_last_hash = item.get("current_hash")
+            yield position, item
+            continue
+        if item["commit"] != committed_count + pending_count or item.get("last_hash") != pending_last_hash:
+            stop_at_torn_tail(f, position)
+            return
+        committed_count += pending_count
+        pending_count = 0
+        yield f.tell(), None
+
+def read_committed_records(f, store, committed_count, last_hash, on_progress=None, offsets_only=False):
+    saved_offset = f.tell()
+    committed_length = len(store)
+    for position, item in iter_committed_records(f, committed_count, last_hash, on_progress):
+        if item is None:
+            saved_offset = position
+            committed_length = len(store)
+        else:
+            store.append(position if offsets_only else InsuranceContract.from_dict(item))
+    del store[committed_length:]
+    return saved_offset
+
+def write_ledger_file(filepath, contracts, committed_count, last_hash):
+    temp_path = filepath + ".tmp"
+    with open(temp_path, 'wb') as f:
+        f.write((json.dumps({"format": LEDGER_FORMAT, "version": LEDGER_VERSION}) + "\n").encode('utf-8'))
+        for contract in contracts:
+            f.write((json.dumps(vars(contract), ensure_ascii=False) + "\n").encode('utf-8'))
+        f.write((json.dumps({"commit": committed_count, "last_hash": last_hash}) + "\n").encode('utf-8'))
+    os.replace(temp_path, filepath)
+
+def parse_date(value):
+    try:
+        day, month, year = str(value).strip().split('.')
+        return datetime.date(int(year), int(month), int(day)).toordinal()
+    except ValueError:
+        return None
+
+def parse_amount(value):
+    if not isinstance(value, (int, float)):
+        value = str(value or '').strip().replace(' ', '').replace(',', '.') or 0.0
+    try:
+        amount = float(value)
+    except ValueError:
+        raise ValueError("Стоимость и Сумма покрытия должны быть числами") from None
+    if not math.isfinite(amount):
+        raise ValueError("Стоимость и Сумма покрытия должны быть конечными числами")
+    return amount
+
+class InsuranceContract:
+    def __init__(self, fio, policy_number, phone, object_insured, risk, 
+                 start_date, end_date, premium, coverage, agent, previous_hash='0', timestamp=None,
+                 current_hash=None):
+        self.fio = fio
+        self.policy_number = policy_number
+        self.phone = phone
+        self.object_insured = object_insured
+        self.risk = risk
+        self.start_date = start_date
+        self.end_date = end_date
+        self.premium = float(premium)
+        self.coverage = float(coverage)
+        self.agent = agent
+        self.timestamp = timestamp if timestamp is not None else datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.previous_hash = previous_hash
+        self.current_hash = current_hash if current_hash is not None else self.calculate_hash()
+
+    def hash_fields(self):
+        return (self.fio, self.policy_number, self.phone, self.object_insured, self.risk,
+                self.start_date, self.end_date, self.premium, self.coverage, self.agent,
+                self.timestamp, self.previous_hash)
+
+    def calculate_hash(self):
+        return compute_block_hash(*self.hash_fields())
+
+    @classmethod
+    def from_dict(cls, item):
+        return cls(
+            item.get('fio', ''), item.get('policy_number', ''), item.get('phone', ''),
+            item.get('object_insured', ''), item.get('risk', ''), item.get('start_date', ''),
+            item.get('end_date', ''), item.get('premium', 0.0), item.get('coverage', 0.0), item.get('agent', 'N/A'),
+            previous_hash=item.get('previous_hash'), timestamp=item.get('timestamp'),
+            current_hash=item.get('current_hash', '')
+        )
+
+class StoredContract(InsuranceContract):
+    __slots__ = ('store', 'index')
+
+    @staticmethod
+    def bind(fields, store, index, set_attribute=object.__setattr__):
+        contract = object.__new__(StoredContract)
+        set_attribute(contract, '__dict__', fields)
+        set_attribute(contract, 'store', store)
+        set_attribute(contract, 'index', index)
+        return contract
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        self.store[self.index] = self
+
+def contract_row_values(contract_id, contract):
+    period = f"{contract.start_date} - {contract.end_date}"
+    return (
+        contract_id, contract.fio, contract.policy_number, contract.phone, contract.object_insured,
+        contract.risk, period, f"{contract.premium:.2f}", f"{contract.coverage:.2f}",
+        contract.agent, contract.current_hash
+    )
+
+def leaf_digest(hash_value):
+    digest = pack_hash(hash_value)
+    return digest if digest is not None else hashlib.sha256(str(hash_value).encode()).digest()
+
+class MerkleTree:
+    HASH_SIZE = 32
+
+    def __init__(self, leaves=()):
+        level = bytearray()
+        for leaf in leaves:
+            level += leaf
+        self.build(level)
+
+    @classmethod
+    def from_leaf_level(cls, level):
+        tree = cls.__new__(cls)
+        tree.build(bytearray(level))
+        return tree
+
+    def build(self, level):
+        self.levels = [level]
+        while len(level) > self.HASH_SIZE:
+            level = self.parent_level(level)
+            self.levels.append(level)
+
+    def copy(self):
+        tree = MerkleTree.__new__(MerkleTree)
+        tree.levels = [bytearray(level) for level in self.levels]
+        return tree
+
+    def __len__(self):
+        return len(self.levels[0]) // self.HASH_SIZE
+
+    @staticmethod
+    def hash_pair(left, right):
+        return hashlib.sha256(left + right).digest()
+
+    @classmethod
+    def parent_level(cls, level):
+        pair_size = 2 * cls.HASH_SIZE
+        parent = bytearray()
+        for start in range(0, len(level), pair_size):
+            pair = level[start:start + pair_size]
+            parent += hashlib.sha256(pair).digest() if len(pair) == pair_size else pair
+        return parent
+
+    def node(self, level, index):
+        return bytes(self.levels[level][index * self.HASH_SIZE:(index + 1) * self.HASH_SIZE])
+
+    def node_count(self, level):
+        return len(self.levels[level]) // self.HASH_SIZE
+
+    def leaf(self, index):
+        return self.node(0, index)
+
+    @property
+    def root(self):
+        return self.node(len(self.levels) - 1, 0) if self.levels[0] else None
+
+    def append(self, leaf):
+        self.levels[0] += leaf
+        self.update_path(len(self) - 1)
+
+    def update(self, index, leaf):
+        self.levels[0][index * self.HASH_SIZE:(index + 1) * self.HASH_SIZE] = leaf
+        self.update_path(index)
+
+    def update_path(self, index):
+        size = self.HASH_SIZE
+        level = 0
+        while len(self.levels[level]) > size:
+            parent = index // 2
+            pair = self.levels[level][parent * 2 * size:(parent + 1) * 2 * size]
+            node = hashlib.sha256(pair).digest() if len(pair) == 2 * size else pair
+            if level + 1 == len(self.levels):
+                self.levels.append(bytearray())
+            self.levels[level + 1][parent * size:(parent + 1) * size] = node
+            index = parent
+            level += 1
+
+    def proof(self, index):
+        path = []
+        for level in range(len(self.levels) - 1):
+            sibling = index ^ 1
+            if sibling < self.node_count(level):
+                path.append((self.node(level, sibling), sibling < index))
+            index //= 2
+        return path
+
+    @classmethod
+    def verify_proof(cls, leaf, path, root):
+        node = leaf
+        for sibling, sibling_is_left in path:
+            node = cls.hash_pair(sibling, node) if sibling_is_left else cls.hash_pair(node, sibling)
+        return node == root
+
+    def diff(self, other):
+        if len(self) != len(other):
+            raise ValueError("Деревья разного размера")
+        if not len(self) or self.root == other.root:
+            return []
+        mismatched = []
+        stack = [(len(self.levels) - 1, 0)]
+        while stack:
+            level, index = stack.pop()
+            if level == 0:
+                mismatched.append(index)
+                continue
+            for child in (index * 2 + 1, index * 2):
+                if child < self.node_count(level - 1) and \
+                        self.node(level - 1, child) != other.node(level - 1, child):
+                    stack.append((level - 1, child))
+        return mismatched
+
+class ReportIndex:
+    DIMENSIONS = ('agent', 'risk', 'object_insured')
+
+    def __init__(self):
+        self.indexes = {dimension: {} for dimension in self.DIMENSIONS}
+        self.totals = {dimension: {} for dimension in self.DIMENSIONS}
+        self.count = 0
+        self.premium = 0.0
+        self.coverage = 0.0
+        self.period_starts = []
+        self.period_ends = {}
+        self.max_period = 0
+
+    def add(self, index, contract):
+        self.count += 1
+        self.premium += contract.premium
+        self.coverage += contract.coverage
+        for dimension in self.DIMENSIONS:
+            value = getattr(contract, dimension)
+            self.indexes[dimension].setdefault(value, set()).add(index)
+            totals = self.totals[dimension].setdefault(value, [0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += contract.premium
+            totals[2] += contract.coverage
+        start, end = parse_date(contract.start_date), parse_date(contract.end_date)
+        if start is not None and end is not None and start <= end:
+            bisect.insort(self.period_starts, (start, index))
+            self.period_ends[index] = end
+            self.max_period = max(self.max_period, end - start)
+
+    def remove(self, index, contract):
+        self.count -= 1
+        self.premium -= contract.premium
+        self.coverage -= contract.coverage
+        for dimension in self.DIMENSIONS:
+            value = getattr(contract, dimension)
+            indexes = self.indexes[dimension][value]
+            indexes.discard(index)
+            totals = self.totals[dimension][value]
+            totals[0] -= 1
+            totals[1] -= contract.premium
+            totals[2] -= contract.coverage
+            if not indexes:
+                del self.indexes[dimension][value]
+                del self.totals[dimension][value]
+        if self.period_ends.pop(index, None) is not None:
+            position = bisect.bisect_left(self.period_starts, (parse_date(contract.start_date), index))
+            del self.period_starts[position]
+
+    @classmethod
+    def check_dimension(cls, dimension):
+        if dimension not in cls.DIMENSIONS:
+            raise ValueError(f"Неизвестное измерение отчета: {dimension}")
+
+    def lookup(self, dimension, value):
+        self.check_dimension(dimension)
+        return sorted(self.indexes[dimension].get(value, ()))
+
+    def totals_by(self, dimension):
+        self.check_dimension(dimension)
+        return {value: {"count": count, "premium": premium, "coverage": coverage}
+                for value, (count, premium, coverage) in self.totals[dimension].items()}
+
+    def active_between(self, start, end):
+        low = bisect.bisect_left(self.period_starts, (start - self.max_period, -1))
+        high = bisect.bisect_right(self.period_starts, (end, float('inf')))
+        return sorted(index for _, index in self.period_starts[low:high] if self.period_ends[index] >= start)
+
+class ContractStore:
+    HASH_SIZE = 32
+    EMPTY_DIGEST = bytes(HASH_SIZE)
+    COLUMNS = ('fio', 'policy_number', 'phone', 'timestamp', 'object_codes', 'risk_codes', 'agent_codes',
+               'start_date_codes', 'end_date_codes', 'premium', 'coverage')
+
+    def __init__(self, contracts=()):
+        self.fio = []
+        self.policy_number = []
+        self.phone = []
+        self.timestamp = []
+        self.object_codes = array('I')
+        self.risk_codes = array('I')
+        self.agent_codes = array('I')
+        self.start_date_codes = array('I')
+        self.end_date_codes = array('I')
+        self.premium = array('d')
+        self.coverage = array('d')
+        self.previous_digests = bytearray()
+        self.current_digests = bytearray()
+        self.raw_hashes = {}
+        self.extend(contracts)
+
+    def __len__(self):
+        return len(self.fio)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("contract index out of range")
+        start, end = index * self.HASH_SIZE, (index + 1) * self.HASH_SIZE
+        fields = {
+            'fio': self.fio[index],
+            'policy_number': self.policy_number[index],
+            'phone': self.phone[index],
+            'object_insured': OBJECT_CATEGORIES.values[self.object_codes[index]],
+            'risk': RISK_CATEGORIES.values[self.risk_codes[index]],
+            'start_date': DATE_CATEGORIES.values[self.start_date_codes[index]],
+            'end_date': DATE_CATEGORIES.values[self.end_date_codes[index]],
+            'premium': self.premium[index],
+            'coverage': self.coverage[index],
+            'agent': AGENT_CATEGORIES.values[self.agent_codes[index]],
+            'timestamp': self.timestamp[index],
+            'previous_hash': self.previous_digests[start:end].hex(),
+            'current_hash': self.current_digests[start:end].hex(),
+        }
+        if self.raw_hashes:
+            fields['previous_hash'] = self.raw_hashes.get((index, 'previous_hash'), fields['previous_hash'])
+            fields['current_hash'] = self.raw_hashes.get((index, 'current_hash'), fields['current_hash'])
+        return StoredContract.bind(fields, self, index)
+
+    def __setitem__(self, index, contract):
+        if index < 0:
+            index += len(self)
+        self.fio[index] = contract.fio
+        self.policy_number[index] = contract.policy_number
+        self.phone[index] = contract.phone
+        self.object_codes[index] = OBJECT_CATEGORIES.encode(contract.object_insured)
+        self.risk_codes[index] = RISK_CATEGORIES.encode(contract.risk)
+        self.start_date_codes[index] = DATE_CATEGORIES.encode(contract.start_date)
+        self.end_date_codes[index] = DATE_CATEGORIES.encode(contract.end_date)
+        self.premium[index] = contract.premium
+        self.coverage[index] = contract.coverage
+        self.agent_codes[index] = AGENT_CATEGORIES.encode(contract.agent)
+        self.timestamp[index] = contract.timestamp
+        self.set_hash(index, 'previous_hash', contract.previous_hash)
+        self.set_hash(index, 'current_hash', contract.current_hash)
+
+    def __delitem__(self, index):
+        if not isinstance(index, slice) or index.step not in (None, 1):
+            raise TypeError("ContractStore supports deleting only contiguous slices")
+        start, end, _ = index.indices(len(self))
+        if start >= end:
+            return
+        for name in self.COLUMNS:
+            del getattr(self, name)[start:end]
+        del self.previous_digests[start * self.HASH_SIZE:end * self.HASH_SIZE]
+        del self.current_digests[start * self.HASH_SIZE:end * self.HASH_SIZE]
+        removed = end - start
+        self.raw_hashes = {(i if i < start else i - removed, key): value
+                           for (i, key), value in self.raw_hashes.items() if not start <= i < end}
+
+    def append(self, contract):
+        self.fio.append(None)
+        self.policy_number.append(None)
+        self.phone.append(None)
+        self.timestamp.append(None)
+        for column in (self.object_codes, self.risk_codes, self.agent_codes,
+                       self.start_date_codes, self.end_date_codes):
+            column.append(0)
+        self.premium.append(0.0)
+        self.coverage.append(0.0)
+        self.previous_digests += self.EMPTY_DIGEST
+        self.current_digests += self.EMPTY_DIGEST
+        self[len(self) - 1] = contract
+
+    def extend(self, contracts):
+        for contract in contracts:
+            self.append(contract)
+
+    def iter_policy_numbers(self):
+        return enumerate(self.policy_number)
+
+    def slice(self, start, end):
+        part = ContractStore()
+        for name in self.COLUMNS:
+            setattr(part, name, getattr(self, name)[start:end])
+        part.previous_digests = self.previous_digests[start * self.HASH_SIZE:end * self.HASH_SIZE]
+        part.current_digests = self.current_digests[start * self.HASH_SIZE:end * self.HASH_SIZE]
+        part.raw_hashes = {(index - start, key): value for (index, key), value in self.raw_hashes.items()
+                           if start <= index < end}
+        return part
+
+    def find_first_invalid(self, start, end, previous_hash):
+        size = self.HASH_SIZE
+        objects, risks, agents, dates = (dictionary.values for dictionary in CATEGORY_DICTIONARIES)
+        fio, policy_number, phone, timestamp = self.fio, self.policy_number, self.phone, self.timestamp
+        object_codes, risk_codes, agent_codes = self.object_codes, self.risk_codes, self.agent_codes
+        start_date_codes, end_date_codes = self.start_date_codes, self.end_date_codes
+        premium, coverage = self.premium, self.coverage
+        previous_digests, current_digests, raw_hashes = self.previous_digests, self.current_digests, self.raw_hashes
+        sha256 = hashlib.sha256
+        previous_digest = pack_hash(previous_hash)
+        for i in range(start, end):
+            if raw_hashes and ((i, 'previous_hash') in raw_hashes or (i, 'current_hash') in raw_hashes):
+                if previous_digest is not None:
+                    previous_hash = previous_digest.hex()
+                contract = self[i]
+                if contract.previous_hash != previous_hash or contract.current_hash != contract.calculate_hash():
+                    return i
+                previous_hash = contract.current_hash
+                previous_digest = pack_hash(previous_hash)
+                continue
+            stored_previous = previous_digests[i * size:(i + 1) * size]
+            if stored_previous != previous_digest:
+                return i
+            block_string = (f"{fio[i]}{policy_number[i]}{phone[i]}"
+                            f"{objects[object_codes[i]]}{risks[risk_codes[i]]}"
+                            f"{dates[start_date_codes[i]]}{dates[end_date_codes[i]]}"
+                            f"{premium[i]:.2f}{coverage[i]:.2f}{agents[agent_codes[i]]}"
+                            f"{timestamp[i]}{stored_previous.hex()}")
+            METRICS.counters["hashes_computed"] += 1
+            previous_digest = current_digests[i * size:(i + 1) * size]
+            if sha256(block_string.encode()).digest() != previous_digest:
+                return i
+        return None
+
+    def digests(self, key):
+        return self.previous_digests if key == 'previous_hash' else self.current_digests
+
+    def get_digest(self, index, key):
+        start = index * self.HASH_SIZE
+        return bytes(self.digests(key)[start:start + self.HASH_SIZE])
+
+    def set_hash(self, index, key, value):
+        digest = pack_hash(value)
+        if digest is None:
+            self.raw_hashes[(index, key)] = value
+            digest = self.EMPTY_DIGEST
+        else:
+            self.raw_hashes.pop((index, key), None)
+        start = index * self.HASH_SIZE
+        self.digests(key)[start:start + self.HASH_SIZE] = digest
+
+class LRUCache:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.items.get(key)
+            if value is not None:
+                self.items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            if len(self.items) > self.capacity:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+class MappedContractStore:
+    CACHE_SIZE = 1024
+
+    def __init__(self, filepath, genesis, known_prefix=None):
+        self.filepath = os.path.abspath(filepath)
+        self.genesis = genesis
+        self.offsets = array('Q')
+        self.overlay = {}
+        self.cache = LRUCache(self.CACHE_SIZE)
+        self.tail = ContractStore()
+        self.file = open(self.filepath, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.saved_offset = 0
+        self.recovered_bytes = 0
+        try:
+            self.build_offsets(known_prefix)
+        except Exception:
+            self.close()
+            raise
+
+    @staticmethod
+    def offset_index_path(filepath):
+        return filepath + ".idx"
+
+    def close(self):
+        self.cache.clear()
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def build_offsets(self, known_prefix=None):
+        header_end = self.map.find(b"\n")
+        try:
+            header = json.loads(self.map[:header_end])
+        except ValueError:
+            header = None
+        if header_end < 0 or not isinstance(header, dict) or header.get("format") != LEDGER_FORMAT:
+            raise ValueError("Неизвестный формат файла реестра")
+
+        self.saved_offset = header_end + 1
+        if known_prefix is not None:
+            self.offsets, self.saved_offset = known_prefix
+            scanned_from = self.saved_offset
+        else:
+            scanned_from = self.load_offset_index() or self.saved_offset
+        self.map.seek(self.saved_offset)
+        last_hash = self[len(self.offsets)].current_hash
+        self.saved_offset = read_committed_records(self.map, self.offsets, len(self.offsets), last_hash,
+                                                   offsets_only=True)
+
+        self.recovered_bytes = len(self.map) - self.saved_offset
+        if self.saved_offset > scanned_from:
+            self.save_offset_index()
+
+    def load_offset_index(self):
+        try:
+            with open(self.offset_index_path(self.filepath), 'rb') as f:
+                header = json.loads(f.readline())
+                offsets = array('Q')
+                offsets.frombytes(f.read())
+            saved_offset = int(header["saved_offset"])
+            commit_line = header["commit_line"].encode('utf-8')
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        stat = os.fstat(self.file.fileno())
+        if header.get("size") != stat.st_size or header.get("mtime_ns") != stat.st_mtime_ns:
+            return None
+        if len(offsets) != header.get("count") or saved_offset > len(self.map):
+            return None
+        if self.map[saved_offset - len(commit_line):saved_offset] != commit_line:
+            return None
+        self.offsets = offsets
+        self.saved_offset = saved_offset
+        return saved_offset
+
+    def save_offset_index(self):
+        line_start = self.map.rfind(b"\n", 0, self.saved_offset - 1) + 1
+        stat = os.fstat(self.file.fileno())
+        header = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "count": len(self.offsets),
+            "saved_offset": self.saved_offset,
+            "commit_line": self.map[line_start:self.saved_offset].decode('utf-8'),
+        }
+        try:
+            with open(self.offset_index_path(self.filepath), 'wb') as f:
+                f.write(json.dumps(header).encode('utf-8') + b"\n")
+                f.write(self.offsets.tobytes())
+        except OSError:
+            pass
+
+    def decode_record(self, offset):
+        end = self.map.find(b"\n", offset)
+        try:
+            return json.loads(self.map[offset:end])
+        except ValueError:
+            raise ValueError(f"Поврежденная запись по смещению {offset}") from None
+
+    def read_record(self, offset):
+        item = self.cache.get(offset)
+        if item is None:
+            item = self.decode_record(offset)
+            self.cache.put(offset, item)
+        return item
+
+    def __len__(self):
+        return 1 + len(self.offsets) + len(self.tail)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index == 0:
+            return self.genesis
+        if index <= len(self.offsets):
+            if index in self.overlay:
+                item = vars(self.overlay[index])
+            else:
+                item = self.read_record(self.offsets[index - 1])
+            return StoredContract.bind(vars(InsuranceContract.from_dict(item)), self, index)
+        return self.tail[index - 1 - len(self.offsets)]
+
+    def __setitem__(self, index, contract):
+        if index < 0:
+            index += len(self)
+        if index == 0:
+            self.genesis = contract
+        elif index <= len(self.offsets):
+            self.overlay[index] = contract
+        else:
+            self.tail[index - 1 - len(self.offsets)] = contract
+
+    def append(self, contract):
+        self.tail.append(contract)
+
+    def extend(self, contracts):
+        self.tail.extend(contracts)
+
+    def iter_policy_numbers(self):
+        yield 0, self.genesis.policy_number
+        for index, offset in enumerate(self.offsets, 1):
+            if index in self.overlay:
+                yield index, self.overlay[index].policy_number
+            else:
+                yield index, self.decode_record(offset).get('policy_number', '')
+        for position, policy_number in self.tail.iter_policy_numbers():
+            yield 1 + len(self.offsets) + position, policy_number
+
+def verify_store_chunk(start_index, previous_hash, store, category_values):
+    for dictionary, values in zip(CATEGORY_DICTIONARIES, category_values):
+        dictionary.sync(values)
+    mismatch = store.find_first_invalid(0, len(store), previous_hash)
+    return start_index + mismatch if mismatch is not None else None
+
+def verify_mapped_chunk(start_index, previous_hash, filepath, offsets, overlay):
+    with open(filepath, 'rb') as f:
+        def iter_contracts():
+            for position, offset in enumerate(offsets):
+                item = overlay.get(start_index + position)
+                if item is None:
+                    f.seek(offset)
+                    try:
+                        item = json.loads(f.readline())
+                    except ValueError:
+                        item = {}
+                yield InsuranceContract.from_dict(item)
+
+        return find_first_invalid_contract(start_index, previous_hash, iter_contracts())
+
+class SegmentedContractStore:
+    MANIFEST = "manifest.json"
+    MANIFEST_FORMAT = "insurance-ledger-segments"
+    TAIL_FILE = "tail.jsonl"
+    SEGMENT_SIZE = 100000
+    CACHED_SEGMENTS = 4
+
+    def __init__(self, genesis, segment_size=None):
+        self.dirpath = None
+        self.genesis = genesis
+        self.segment_size = segment_size or self.SEGMENT_SIZE
+        self.segments = []
+        self.tail = ContractStore()
+        self.cache = LRUCache(self.CACHED_SEGMENTS)
+        self.overlay = {}
+        self.verified_segments = set()
+        self.failed_segments = set()
+        self.on_segment_failure = None
+
+    @classmethod
+    def open(cls, dirpath, genesis):
+        with open(os.path.join(dirpath, cls.MANIFEST), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get("format") != cls.MANIFEST_FORMAT:
+            raise ValueError("Неизвестный формат каталога реестра")
+        store = cls(genesis, manifest["segment_size"])
+        store.dirpath = os.path.abspath(dirpath)
+        store.segments = manifest["segments"]
+        tail_path = os.path.join(dirpath, cls.TAIL_FILE)
+        if os.path.exists(tail_path):
+            with open(tail_path, 'rb') as f:
+                read_ledger_header(f)
+                read_committed_records(f, store.tail, store.sealed_count, store.sealed_last_hash())
+        return store
+
+    @property
+    def sealed_count(self):
+        return len(self.segments) * self.segment_size
+
+    def sealed_last_hash(self):
+        return self.segments[-1]["last_hash"] if self.segments else self.genesis.current_hash
+
+    @staticmethod
+    def segment_anchor(previous_anchor, merkle_root, last_hash):
+        return hashlib.sha256(f"{previous_anchor}{merkle_root}{last_hash}".encode()).hexdigest()
+
+    def find_broken_anchor(self):
+        anchor = self.genesis.current_hash
+        last_hash = self.genesis.current_hash
+        for number, segment in enumerate(self.segments):
+            anchor = self.segment_anchor(anchor, segment["merkle_root"], segment["last_hash"])
+            if (segment["anchor"] != anchor or segment["previous_hash"] != last_hash
+                    or segment["first_index"] != number * self.segment_size + 1):
+                return number
+            last_hash = segment["last_hash"]
+        return None
+
+    def segment_path(self, number):
+        return os.path.join(self.dirpath, self.segments[number]["file"])
+
+    def read_segment(self, number):
+        segment = self.segments[number]
+        contracts = ContractStore()
+        with open(self.segment_path(number), 'rb') as f:
+            try:
+                read_ledger_header(f)
+                read_committed_records(f, contracts, segment["first_index"] - 1, segment["previous_hash"])
+            except ValueError as e:
+                raise ValueError(f"Сегмент {segment['file']} поврежден: {e}") from None
+        if len(contracts) != self.segment_size:
+            raise ValueError(f"Сегмент {segment['file']} поврежден: прочитано {len(contracts)} "
+                             f"договоров из {self.segment_size}")
+        return contracts
+
+    def verify_segment(self, number, contracts):
+        segment = self.segments[number]
+        previous_hash = segment["previous_hash"]
+        for contract in contracts:
+            if contract.previous_hash != previous_hash or contract.current_hash != contract.calculate_hash():
+                return False
+            previous_hash = contract.current_hash
+        merkle_root = MerkleTree(leaf_digest(contract.current_hash) for contract in contracts).root
+        return previous_hash == segment["last_hash"] and merkle_root.hex() == segment["merkle_root"]
+
+    def load_segment(self, number):
+        contracts = self.cache.get(number)
+        if contracts is not None:
+            return contracts
+        contracts = self.read_segment(number)
+        if number not in self.verified_segments and number not in self.failed_segments:
+            if self.verify_segment(number, contracts):
+                self.verified_segments.add(number)
+            else:
+                self.failed_segments.add(number)
+                if self.on_segment_failure is not None:
+                    self.on_segment_failure(self.segments[number]["first_index"])
+        self.cache.put(number, contracts)
+        return contracts
+
+    def __len__(self):
+        return 1 + self.sealed_count + len(self.tail)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index == 0:
+            return self.genesis
+        if index > self.sealed_count:
+            return self.tail[index - 1 - self.sealed_count]
+        if not 0 < index < len(self):
+            raise IndexError("contract index out of range")
+        if index in self.overlay:
+            return StoredContract.bind(dict(vars(self.overlay[index])), self, index)
+        number, position = divmod(index - 1, self.segment_size)
+        return StoredContract.bind(vars(self.load_segment(number)[position]), self, index)
+
+    def __setitem__(self, index, contract):
+        if index < 0:
+            index += len(self)
+        if index == 0:
+            self.genesis = contract
+        elif index <= self.sealed_count:
+            self.overlay[index] = contract
+        else:
+            self.tail[index - 1 - self.sealed_count] = contract
+
+    def append(self, contract):
+        self.tail.append(contract)
+
+    def extend(self, contracts):
+        self.tail.extend(contracts)
+
+    def iter_policy_numbers(self):
+        for number, segment in enumerate(self.segments):
+            contracts = self.cache.get(number)
+            if contracts is None:
+                contracts = self.read_segment(number)
+            for position, policy_number in contracts.iter_policy_numbers():
+                if segment["first_index"] + position not in self.overlay:
+                    yield segment["first_index"] + position, policy_number
+        for position, policy_number in self.tail.iter_policy_numbers():
+            yield self.sealed_count + 1 + position, policy_number
+        for index, contract in self.overlay.items():
+            yield index, contract.policy_number
+
+    def save(self, dirpath):
+        dirpath = os.path.abspath(dirpath)
+        if self.dirpath is not None and dirpath != self.dirpath:
+            raise ValueError("Сегментированный реестр сохраняется только в свой каталог")
+        os.makedirs(dirpath, exist_ok=True)
+        self.dirpath = dirpath
+
+        edited_segments = {number: self.load_segment(number)
+                           for number in sorted({(index - 1) // self.segment_size for index in self.overlay})}
+        for number, contracts in edited_segments.items():
+            for index in [i for i in self.overlay if (i - 1) // self.segment_size == number]:
+                contracts[(index - 1) % self.segment_size] = self.overlay.pop(index)
+            segment = self.segments[number]
+            write_ledger_file(self.segment_path(number), contracts,
+                              segment["first_index"] - 1 + len(contracts), contracts[-1].current_hash)
+
+        while len(self.tail) >= self.segment_size:
+            contracts = ContractStore(self.tail[i] for i in range(self.segment_size))
+            number = len(self.segments)
+            merkle_root = MerkleTree(leaf_digest(contract.current_hash) for contract in contracts).root.hex()
+            last_hash = contracts[-1].current_hash
+            anchor = self.segment_anchor(self.segments[-1]["anchor"] if self.segments else self.genesis.current_hash,
+                                         merkle_root, last_hash)
+            segment = {
+                "file": f"segment-{number:06d}.jsonl",
+                "first_index": self.sealed_count + 1,
+                "count": len(contracts),
+                "previous_hash": self.sealed_last_hash(),
+                "last_hash": last_hash,
+                "merkle_root": merkle_root,
+                "anchor": anchor,
+            }
+            self.segments.append(segment)
+            write_ledger_file(self.segment_path(number), contracts, self.sealed_count, last_hash)
+            self.tail = ContractStore(self.tail[i] for i in range(self.segment_size, len(self.tail)))
+            self.cache.put(number, contracts)
+            self.verified_segments.add(number)
+
+        last_hash = self.tail[-1].current_hash if len(self.tail) else self.sealed_last_hash()
+        write_ledger_file(os.path.join(dirpath, self.TAIL_FILE), self.tail,
+                          self.sealed_count + len(self.tail), last_hash)
+        manifest = {
+            "format": self.MANIFEST_FORMAT,
+            "version": 1,
+            "segment_size": self.segment_size,
+            "segments": self.segments,
+        }
+        temp_path = os.path.join(dirpath, self.MANIFEST + ".tmp")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, os.path.join(dirpath, self.MANIFEST))
+
+class HashChainDB:
+    PARALLEL_VERIFY_THRESHOLD = 200000
+    VERIFY_CHUNK_SIZE = 50000
+
+    MAPPED_STORAGE_THRESHOLD = 256 * 1024 * 1024
+
+    def __init__(self, storage="auto"):
+        self.storage = storage
+        self.chain = None
+        self.reset()
+
+    def reset(self):
+        self.close()
+        if self.storage == "segmented":
+            self.chain = SegmentedContractStore(self.create_genesis_block())
+            self.chain.on_segment_failure = self.invalidate_from
+        else:
+            self.chain = [] if self.storage == "list" else ContractStore()
+            self.chain.append(self.create_genesis_block())
+        self.policy_index = {}
+        self.policy_duplicates = {}
+        self.verified_up_to = 0
+        self.merkle = None
+        self.content_merkle = None
+        self.hashed_up_to = 0
+        self.edited_indices = set()
+        self.reports = None
+        self.saved_path = None
+        self.saved_count = 0
+        self.saved_offset = 0
+        self.needs_rewrite = False
+        self.recovered_bytes = 0
+
+    def create_genesis_block(self):
+        return InsuranceContract("Genesis", "N/A", "N/A", "N/A", "N/A", "N/A", "N/A", 0, 0, "N/A", "0", timestamp="2025-01-01 00:00:00")
+
+    def close(self):
+        if isinstance(self.chain, MappedContractStore):
+            self.chain.close()
+
+    def get_last_contract(self):
+        return self.chain[-1]
+    
+    def rebuild_policy_index(self, progress=None, cancel=None):
+        policy_index = {}
+        policy_duplicates = {}
+        if hasattr(self.chain, "iter_policy_numbers"):
+            policy_numbers = self.chain.iter_policy_numbers()
+        else:
+            policy_numbers = ((i, contract.policy_number) for i, contract in enumerate(self.chain))
+        for count, (i, policy_number) in enumerate(policy_numbers):
+            if count % PROGRESS_INTERVAL == 0 and (progress is not None or cancel is not None):
+                report_progress(progress, cancel, count, len(self.chain))
+            if i > 0 and policy_index.setdefault(policy_number, i) != i:
+                policy_duplicates.setdefault(policy_number, []).append(i)
+        for indices in policy_duplicates.values():
+            indices.sort()
+        self.policy_index = policy_index
+        self.policy_duplicates = policy_duplicates
+
+    def index_policy_number(self, policy_number, index):
+        if self.policy_index.setdefault(policy_number, index) != index:
+            bisect.insort(self.policy_duplicates.setdefault(policy_number, []), index)
+
+    def unindex_policy_number(self, policy_number, index):
+        duplicates = self.policy_duplicates.get(policy_number, [])
+        if self.policy_index.get(policy_number) == index:
+            if duplicates:
+                self.policy_index[policy_number] = duplicates.pop(0)
+            else:
+                del self.policy_index[policy_number]
+        elif index in duplicates:
+            duplicates.remove(index)
+        if not duplicates:
+            self.policy_duplicates.pop(policy_number, None)
+
+    def get_policy_index(self, progress=None, cancel=None):
+        if self.policy_index is None:
+            self.rebuild_policy_index(progress, cancel)
+        return self.policy_index
+
+    def is_policy_number_unique(self, policy_number):
+        return policy_number not in self.get_policy_index()
+
+    def get_contract_index_by_policy(self, policy_number):
+        return self.get_policy_index().get(policy_number)
+
+    def get_contract_by_policy(self, policy_number):
+        index = self.get_policy_index().get(policy_number)
+        return self.chain[index] if index is not None else None
+
+    def add_contract(self, *args, **kwargs):
+        previous_hash = self.get_last_contract().current_hash
+        new_contract = InsuranceContract(*args, **kwargs, previous_hash=previous_hash)
+        self.append_contract(new_contract)
+        return new_contract
+
+    def append_contract(self, contract):
+        METRICS.counters["contracts_added"] += 1
+        if self.verified_up_to == len(self.chain) - 1:
+            self.verified_up_to += 1
+        self.chain.append(contract)
+        if self.policy_index is not None:
+            self.index_policy_number(contract.policy_number, len(self.chain) - 1)
+        if self.merkle is not None:
+            leaf = leaf_digest(contract.current_hash)
+            self.merkle.append(leaf)
+            self.content_merkle.append(leaf)
+        if self.reports is not None:
+            self.reports.add(len(self.chain) - 1, contract)
+
+    def import_contracts(self, rows):
+        imported = 0
+        rejected = []
+        previous_hash = self.get_last_contract().current_hash
+        policy_index = self.get_policy_index()
+        for line_no, row in rows:
+            if not isinstance(row, dict):
+                rejected.append((line_no, "Некорректная запись"))
+                continue
+            data = {key: row.get(key) if row.get(key) is not None else '' for key in IMPORT_FIELDS}
+            for key in IMPORT_FIELDS:
+                if isinstance(data[key], str):
+                    data[key] = data[key].strip()
+            if not data["fio"] or not data["policy_number"] or not data["agent"]:
+                rejected.append((line_no, "ФИО, Номер полиса и Агент являются обязательными полями"))
+                continue
+            data["policy_number"] = str(data["policy_number"])
+            if data["policy_number"] in policy_index:
+                rejected.append((line_no, f"Номер полиса '{data['policy_number']}' уже существует"))
+                continue
+            try:
+                data["premium"] = parse_amount(data["premium"])
+                data["coverage"] = parse_amount(data["coverage"])
+            except ValueError as e:
+                rejected.append((line_no, str(e)))
+                continue
+            contract = InsuranceContract(**data, previous_hash=previous_hash, timestamp=row.get('timestamp') or None)
+            self.append_contract(contract)
+            previous_hash = contract.current_hash
+            imported += 1
+        return imported, rejected
+
+    def update_contract(self, index, key, value):
+        contract = self.chain[index]
+        if key == "policy_number" and value != contract.policy_number and self.policy_index is not None:
+            self.unindex_policy_number(contract.policy_number, index)
+            self.index_policy_number(value, index)
+        if self.reports is not None:
+            self.reports.remove(index, contract)
+        setattr(contract, key, value)
+        if self.reports is not None:
+            self.reports.add(index, contract)
+        self.chain[index] = contract
+        self.invalidate_from(index)
+        if index <= self.saved_count:
+            self.needs_rewrite = True
+        if self.merkle is not None:
+            self.merkle.update(index, leaf_digest(contract.current_hash))
+            self.content_merkle.update(index, leaf_digest(contract.calculate_hash()))
+        else:
+            self.edited_indices.add(index)
+
+    def get_reports(self):
+        if self.reports is None:
+            self.reports = ReportIndex()
+            for i in range(1, len(self.chain)):
+                self.reports.add(i, self.chain[i])
+        return self.reports
+
+    def find_contract_indices(self, dimension, value):
+        return self.get_reports().lookup(dimension, value)
+
+    def totals_by(self, dimension):
+        return self.get_reports().totals_by(dimension)
+
+    def find_active_contract_indices(self, start_date=None, end_date=None, dimension=None, value=None):
+        if dimension is not None:
+            ReportIndex.check_dimension(dimension)
+        start = parse_date(start_date) if start_date else datetime.date.min.toordinal()
+        end = parse_date(end_date) if end_date else datetime.date.max.toordinal()
+        if start is None or end is None:
+            raise ValueError("Даты должны быть в формате ДД.ММ.ГГГГ")
+        indices = self.get_reports().active_between(start, end)
+        if dimension is not None:
+            matching = self.reports.indexes[dimension].get(value, set())
+            indices = [index for index in indices if index in matching]
+        return indices
+
+    def active_totals_by(self, dimension, start_date=None, end_date=None):
+        ReportIndex.check_dimension(dimension)
+        totals = {}
+        for index in self.find_active_contract_indices(start_date, end_date):
+            contract = self.chain[index]
+            entry = totals.setdefault(getattr(contract, dimension), {"count": 0, "premium": 0.0, "coverage": 0.0})
+            entry["count"] += 1
+            entry["premium"] += contract.premium
+            entry["coverage"] += contract.coverage
+        return totals
+
+    def stored_leaf_level(self, progress=None, cancel=None):
+        if isinstance(self.chain, ContractStore):
+            level = bytearray(self.chain.current_digests)
+            for (index, key), value in self.chain.raw_hashes.items():
+                if key == 'current_hash':
+                    level[index * MerkleTree.HASH_SIZE:(index + 1) * MerkleTree.HASH_SIZE] = leaf_digest(value)
+            return level
+        level = bytearray()
+        for i in range(len(self.chain)):
+            if i % PROGRESS_INTERVAL == 0:
+                report_progress(progress, cancel, i, len(self.chain))
+            level += leaf_digest(self.chain[i].current_hash)
+        return level
+
+    def ensure_merkle(self, progress=None, cancel=None):
+        if self.merkle is not None:
+            return
+        stored_level = self.stored_leaf_level(progress, cancel)
+        clean_up_to = max(self.hashed_up_to, self.verified_up_to)
+        candidates = sorted(self.edited_indices.union(range(clean_up_to + 1, len(self.chain))))
+        content_leaves = {}
+        for position, index in enumerate(candidates):
+            if position % PROGRESS_INTERVAL == 0:
+                report_progress(progress, cancel, position, len(candidates))
+            leaf = leaf_digest(self.chain[index].calculate_hash())
+            if leaf != stored_level[index * MerkleTree.HASH_SIZE:(index + 1) * MerkleTree.HASH_SIZE]:
+                content_leaves[index] = leaf
+
+        self.merkle = MerkleTree.from_leaf_level(stored_level)
+        self.content_merkle = self.merkle.copy()
+        for index, leaf in content_leaves.items():
+            self.content_merkle.update(index, leaf)
+        self.edited_indices = set()
+
+    def get_merkle_root(self):
+        self.ensure_merkle()
+        return self.merkle.root.hex()
+
+    def find_tampered_indices(self, progress=None, cancel=None):
+        self.ensure_merkle(progress, cancel)
+        return self.merkle.diff(self.content_merkle)
+
+    def get_inclusion_proof(self, policy_number):
+        index = self.get_contract_index_by_policy(policy_number)
+        if index is None:
+            return None
+        self.ensure_merkle()
+        return {
+            "index": index,
+            "leaf": self.merkle.leaf(index).hex(),
+            "root": self.merkle.root.hex(),
+            "path": [(sibling.hex(), sibling_is_left) for sibling, sibling_is_left in self.merkle.proof(index)],
+        }
+
+    @staticmethod
+    def verify_inclusion_proof(proof, contract=None):
+        leaf = bytes.fromhex(proof["leaf"])
+        if contract is not None and leaf_digest(contract.calculate_hash()) != leaf:
+            return False
+        path = [(bytes.fromhex(sibling), sibling_is_left) for sibling, sibling_is_left in proof["path"]]
+        return MerkleTree.verify_proof(leaf, path, bytes.fromhex(proof["root"]))
+
+    def set_verified_up_to(self, index):
+        self.hashed_up_to = max(self.hashed_up_to, self.verified_up_to)
+        self.verified_up_to = index
+
+    def invalidate_from(self, index):
+        self.set_verified_up_to(max(0, min(self.verified_up_to, index - 1)))
+
+    @timed("validation")
+    def is_chain_valid(self, full=False, progress=None, cancel=None):
+        start = 1 if full else self.verified_up_to + 1
+        if start >= len(self.chain):
+            return True, -1
+        previous_hash = self.chain[start - 1].current_hash
+        for chunk_start in range(start, len(self.chain), PROGRESS_INTERVAL):
+            if progress is not None or cancel is not None:
+                if cancel is not None and cancel.is_set():
+                    self.verified_up_to = max(self.verified_up_to, chunk_start - 1)
+                report_progress(progress, cancel, chunk_start - start, len(self.chain) - start)
+            chunk_end = min(chunk_start + PROGRESS_INTERVAL, len(self.chain))
+            if isinstance(self.chain, ContractStore):
+                mismatch = self.chain.find_first_invalid(chunk_start, chunk_end, previous_hash)
+            else:
+                contracts = (self.chain[i] for i in range(chunk_start, chunk_end))
+                mismatch = find_first_invalid_contract(chunk_start, previous_hash, contracts)
+            if mismatch is not None:
+                self.set_verified_up_to(mismatch - 1)
+                return False, mismatch
+            previous_hash = self.chain[chunk_end - 1].current_hash
+        failed_index = self.find_segment_failure()
+        if failed_index is not None:
+            self.set_verified_up_to(failed_index - 1)
+            return False, failed_index
+        self.verified_up_to = len(self.chain) - 1
+        return True, -1
+
+    def find_segment_failure(self):
+        if not isinstance(self.chain, SegmentedContractStore):
+            return None
+        failed_numbers = set(self.chain.failed_segments)
+        broken_anchor = self.chain.find_broken_anchor()
+        if broken_anchor is not None:
+            failed_numbers.add(broken_anchor)
+        if not failed_numbers:
+            return None
+        return self.chain.segments[min(failed_numbers)]["first_index"]
+
+    def verify_chunk_task(self, chunk_start, chunk_end):
+        previous_hash = self.chain[chunk_start - 1].current_hash
+        if isinstance(self.chain, MappedContractStore) and chunk_end <= len(self.chain.offsets) + 1:
+            overlay = {index: vars(contract) for index, contract in self.chain.overlay.items()
+                       if chunk_start <= index < chunk_end}
+            offsets = self.chain.offsets[chunk_start - 1:chunk_end - 1]
+            return verify_mapped_chunk, (chunk_start, previous_hash, self.chain.filepath, offsets, overlay)
+        if isinstance(self.chain, ContractStore):
+            store = self.chain.slice(chunk_start, chunk_end)
+        else:
+            store = ContractStore(self.chain[i] for i in range(chunk_start, chunk_end))
+        category_values = [dictionary.values for dictionary in CATEGORY_DICTIONARIES]
+        return verify_store_chunk, (chunk_start, previous_hash, store, category_values)
+
+    @timed("validation")
+    def is_chain_valid_parallel(self, full=False, workers=None, chunk_size=None, progress=None, cancel=None):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        start = 1 if full else self.verified_up_to + 1
+        chunk_size = chunk_size or self.VERIFY_CHUNK_SIZE
+        workers = workers or os.cpu_count() or 1
+        limit = len(self.chain)
+        first_bad = None
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            chunk_starts = iter(range(start, limit, chunk_size))
+            pending = deque()
+            try:
+                while True:
+                    while len(pending) < workers * 2:
+                        chunk_start = next(chunk_starts, None)
+                        if chunk_start is None:
+                            break
+                        chunk_end = min(chunk_start + chunk_size, limit)
+                        task, task_args = self.verify_chunk_task(chunk_start, chunk_end)
+                        pending.append((executor.submit(task, *task_args), chunk_start, chunk_end))
+                    if not pending:
+                        break
+                    future, chunk_start, chunk_end = pending.popleft()
+                    mismatch = future.result()
+                    METRICS.increment("hashes_computed", (mismatch + 1 if mismatch is not None else chunk_end) - chunk_start)
+                    if mismatch is not None:
+                        first_bad = mismatch
+                        break
+                    report_progress(progress, cancel, chunk_end - start, limit - start)
+            finally:
+                for future, _, _ in pending:
+                    future.cancel()
+
+        failed_index = self.find_segment_failure()
+        if failed_index is not None and (first_bad is None or failed_index < first_bad):
+            first_bad = failed_index
+        if first_bad is not None:
+            self.set_verified_up_to(first_bad - 1)
+            return False, first_bad
+        self.verified_up_to = len(self.chain) - 1
+        return True, -1
+
+    def use_mapped_storage(self, filepath):
+        if self.storage == "mapped":
+            return True
+        return self.storage == "auto" and os.path.getsize(filepath) >= self.MAPPED_STORAGE_THRESHOLD
+
+    @timed("load")
+    def load_from_filepath(self, filepath, progress=None, cancel=None):
+        if os.path.isdir(filepath):
+            self.load_segments(filepath)
+            return
+        self.reset()
+        size = os.path.getsize(filepath)
+        on_progress = lambda position: report_progress(progress, cancel, position, size)
+        with open(filepath, 'rb') as f:
+            is_legacy = f.read(64).lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"[")
+            f.seek(0)
+            if is_legacy:
+                self.load_legacy_array(f, on_progress)
+            elif not self.use_mapped_storage(filepath):
+                self.load_ledger_lines(f, on_progress)
+        if not is_legacy and self.use_mapped_storage(filepath):
+            self.map_ledger(filepath)
+        else:
+            self.rebuild_policy_index()
+        self.saved_path = os.path.abspath(filepath)
+        self.load_checkpoint(filepath)
+        METRICS.increment("contracts_loaded", len(self.chain) - 1)
+
+    def load_segments(self, dirpath):
+        self.reset()
+        self.chain = SegmentedContractStore.open(dirpath, self.chain[0])
+        self.chain.on_segment_failure = self.invalidate_from
+        self.saved_path = os.path.abspath(dirpath)
+        self.saved_count = len(self.chain) - 1
+        self.policy_index = None
+        self.load_checkpoint(dirpath)
+        broken_segment = self.chain.find_broken_anchor()
+        if broken_segment is not None:
+            self.invalidate_from(self.chain.segments[broken_segment]["first_index"])
+        METRICS.increment("contracts_loaded", len(self.chain) - 1)
+
+    def segment_ledger(self, dirpath, segment_size=None):
+        segmented = SegmentedContractStore(self.chain[0], segment_size)
+        segmented.extend(self.chain[i] for i in range(1, len(self.chain)))
+        segmented.save(dirpath)
+        self.close()
+        self.chain = segmented
+        self.chain.on_segment_failure = self.invalidate_from
+        self.storage = "segmented"
+        self.saved_path = segmented.dirpath
+        self.saved_count = len(self.chain) - 1
+        self.needs_rewrite = False
+
+    def map_ledger(self, filepath):
+        genesis = self.chain[0]
+        self.close()
+        self.chain = MappedContractStore(filepath, genesis)
+        self.saved_count = len(self.chain) - 1
+        self.saved_offset = self.chain.saved_offset
+        self.recovered_bytes = self.chain.recovered_bytes
+        self.policy_index = None
+
+    def load_legacy_array(self, f, on_progress=None):
+        for item in iter_json_array(f):
+            self.chain.append(InsuranceContract.from_dict(item))
+            if on_progress is not None and len(self.chain) % PROGRESS_INTERVAL == 0:
+                on_progress(f.tell())
+        self.saved_count = len(self.chain) - 1
+        self.needs_rewrite = True
+
+    def load_ledger_lines(self, f, on_progress=None):
+        read_ledger_header(f)
+        self.saved_offset = read_committed_records(f, self.chain, len(self.chain) - 1, self.chain[-1].current_hash,
+                                                   on_progress)
+        self.saved_count = len(self.chain) - 1
+        self.recovered_bytes = f.seek(0, os.SEEK_END) - self.saved_offset
+
+    @timed("save")
+    def save_to_filepath(self, filepath, progress=None, cancel=None):
+        filepath = os.path.abspath(filepath)
+        if isinstance(self.chain, SegmentedContractStore):
+            self.chain.save(filepath)
+            METRICS.increment("contracts_saved", len(self.chain) - 1 - self.saved_count)
+            self.saved_path = filepath
+            self.saved_count = len(self.chain) - 1
+            self.needs_rewrite = False
+            return
+        can_append = (not self.needs_rewrite and filepath == self.saved_path
+                      and os.path.exists(filepath))
+        if can_append and self.saved_count == len(self.chain) - 1 and not self.recovered_bytes:
+            return
+        if can_append and os.path.getsize(filepath) != self.saved_offset + self.recovered_bytes:
+            raise ValueError("Файл реестра изменился после загрузки, дозапись отменена")
+
+        start = self.saved_count + 1 if can_append else 1
+        lines = []
+        for i in range(start, len(self.chain)):
+            if (i - start) % PROGRESS_INTERVAL == 0:
+                report_progress(progress, cancel, i - start, len(self.chain) - start)
+            lines.append(json.dumps(vars(self.chain[i]), ensure_ascii=False) + "\n")
+        lines.append(json.dumps({"commit": len(self.chain) - 1,
+                                 "last_hash": self.chain[-1].current_hash}) + "\n")
+        payload = "".join(lines).encode('utf-8')
+
+        is_mapped = isinstance(self.chain, MappedContractStore)
+        known_prefix = (self.chain.offsets, self.saved_offset) if is_mapped and can_append else None
+        if is_mapped:
+            self.chain.close()
+        if can_append:
+            with open(filepath, 'r+b') as f:
+                f.seek(self.saved_offset)
+                f.write(payload)
+                f.truncate()
+                self.saved_offset = f.tell()
+        else:
+            header = json.dumps({"format": LEDGER_FORMAT, "version": LEDGER_VERSION}) + "\n"
+            temp_path = filepath + ".tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(header.encode('utf-8'))
+                f.write(payload)
+                self.saved_offset = f.tell()
+            os.replace(temp_path, filepath)
+            if os.path.exists(MappedContractStore.offset_index_path(filepath)):
+                os.remove(MappedContractStore.offset_index_path(filepath))
+
+        METRICS.increment("contracts_saved", len(self.chain) - start)
+        self.saved_path = filepath
+        self.saved_count = len(self.chain) - 1
+        self.needs_rewrite = False
+        self.recovered_bytes = 0
+        if is_mapped:
+            self.chain = MappedContractStore(filepath, self.chain.genesis, known_prefix)
+
+    @staticmethod
+    def ledger_file_path(filepath):
+        if os.path.isdir(filepath):
+            return os.path.join(filepath, SegmentedContractStore.MANIFEST)
+        return filepath
+
+    @classmethod
+    def checkpoint_path(cls, filepath):
+        return cls.ledger_file_path(filepath) + ".checkpoint"
+
+    @classmethod
+    def ledger_file_stats(cls, filepath):
+        if not os.path.isdir(filepath):
+            stat = os.stat(filepath)
+            return {os.path.basename(filepath): [stat.st_size, stat.st_mtime_ns]}
+        stats = {}
+        for entry in os.scandir(filepath):
+            if entry.is_file() and not entry.name.endswith((".checkpoint", ".tmp")):
+                stat = entry.stat()
+                stats[entry.name] = [stat.st_size, stat.st_mtime_ns]
+        return stats
+
+    def save_checkpoint(self, filepath):
+        checkpoint = {
+            "verified_up_to": self.verified_up_to,
+            "hash": self.chain[self.verified_up_to].current_hash,
+            "files": self.ledger_file_stats(filepath),
+        }
+        with open(self.checkpoint_path(filepath), 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f)
+
+    def load_checkpoint(self, filepath):
+        self.verified_up_to = 0
+        try:
+            with open(self.checkpoint_path(filepath), 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            stats = self.ledger_file_stats(filepath)
+            index = int(checkpoint["verified_up_to"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        if checkpoint.get("files") != stats:
+            return
+        if not 0 < index < len(self.chain):
+            return
+        self.verified_up_to = index
+        if self.chain[index].current_hash != checkpoint.get("hash"):
+            self.verified_up_to = 0
+
+def run_import(args):
+    db = HashChainDB()
+    if os.path.exists(args.ledger):
+        db.load_from_filepath(args.ledger)
+    is_valid, error_index = db.is_chain_valid()
+    if not is_valid:
+        print(f"Реестр {args.ledger} поврежден (запись {error_index}), импорт отменен.", file=sys.stderr)
+        return 1
+
+    started = time.perf_counter()
+    imported, rejected = db.import_contracts(iter_import_rows(args.source))
+    elapsed = time.perf_counter() - started
+    if imported:
+        db.save_to_filepath(args.ledger)
+        db.save_checkpoint(args.ledger)
+
+    if args.rejects:
+        import csv
+
+        with open(args.rejects, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(("line", "reason"))
+            writer.writerows(rejected)
+    for line_no, reason in rejected[:20]:
+        print(f"Строка {line_no}: {reason}", file=sys.stderr)
+    if len(rejected) > 20:
+        print(f"... и еще {len(rejected) - 20} отклоненных строк", file=sys.stderr)
+
+    rate = imported / elapsed if elapsed > 0 else 0
+    print(f"Импортировано: {imported}, отклонено: {len(rejected)}, {rate:.0f} записей/с")
+    return 0
+
+def load_ledger(filepath):
+    db = HashChainDB()
+    if os.path.exists(filepath):
+        db.load_from_filepath(filepath)
+    return db
+
+def run_verify(args):
+    db = load_ledger(args.ledger)
+    started = time.perf_counter()
+    if args.parallel:
+        is_valid, error_index = db.is_chain_valid_parallel(full=args.full, workers=args.workers,
+                                                            chunk_size=args.chunk_size)
+    else:
+        is_valid, error_index = db.is_chain_valid(full=args.full)
+    elapsed = time.perf_counter() - started
+    if os.path.exists(args.ledger) and db.saved_count == len(db.chain) - 1:
+        db.save_checkpoint(args.ledger)
+    if is_valid:
+        print(f"Целостность подтверждена: {len(db.chain) - 1} договоров, {elapsed:.3f} с")
+        return 0
+    print(f"НАРУШЕНИЕ ЦЕЛОСТНОСТИ в записи с ID {error_index}", file=sys.stderr)
+    return 2
+
+def run_append(args):
+    db = load_ledger(args.ledger)
+    is_valid, error_index = db.is_chain_valid()
+    if not is_valid:
+        print(f"Реестр {args.ledger} поврежден (запись {error_index}), добавление отменено.", file=sys.stderr)
+        return 1
+    if not db.is_policy_number_unique(args.policy_number):
+        print(f"Номер полиса '{args.policy_number}' уже существует!", file=sys.stderr)
+        return 1
+    try:
+        premium = parse_amount(args.premium)
+        coverage = parse_amount(args.coverage)
+    except ValueError as e:
+        print(f"{e}!", file=sys.stderr)
+        return 1
+    contract = db.add_contract(args.fio, args.policy_number, args.phone, args.object_insured, args.risk,
+                               args.start_date, args.end_date, premium, coverage, args.agent)
+    db.save_to_filepath(args.ledger)
+    db.save_checkpoint(args.ledger)
+    print(f"Договор добавлен: ID {len(db.chain) - 1}, хэш {contract.current_hash}")
+    return 0
+
+def run_stats(args):
+    db = load_ledger(args.ledger)
+    reports = db.get_reports()
+    totals = None
+    if args.by:
+        try:
+            if args.start_date or args.end_date:
+                totals = db.active_totals_by(args.by, args.start_date, args.end_date)
+            else:
+                totals = db.totals_by(args.by)
+        except ValueError as e:
+            print(f"{e}!", file=sys.stderr)
+            return 1
+    if os.path.isdir(args.ledger):
+        size = sum(entry.stat().st_size for entry in os.scandir(args.ledger) if entry.is_file())
+    else:
+        size = os.path.getsize(args.ledger) if os.path.exists(args.ledger) else 0
+    print(f"Файл: {args.ledger} ({size} байт)")
+    print(f"Договоров: {len(db.chain) - 1}")
+    print(f"Проверено до записи: {db.verified_up_to}")
+    print(f"Сумма стоимости: {reports.premium:.2f}")
+    print(f"Сумма покрытия: {reports.coverage:.2f}")
+    print(f"Последний хэш: {db.get_last_contract().current_hash}")
+    if totals is not None:
+        for value, entry in sorted(totals.items(), key=lambda item: -item[1]["premium"]):
+            print(f"  {value}: {entry['count']} договоров, стоимость {entry['premium']:.2f}, покрытие {entry['coverage']:.2f}")
+    return 0
+
+def run_segment(args):
+    db = load_ledger(args.source)
+    is_valid, error_index = db.is_chain_valid()
+    if not is_valid:
+        print(f"Реестр {args.source} поврежден (запись {error_index}), разбиение отменено.", file=sys.stderr)
+        return 1
+    db.segment_ledger(args.destination, args.segment_size)
+    db.save_checkpoint(args.destination)
+    print(f"Реестр разбит на {len(db.chain.segments)} сегментов, в активном хвосте {len(db.chain.tail)} договоров")
+    return 0
+
+def dump_metrics(fmt, filepath=None):
+    text = METRICS.export(fmt)
+    if filepath:
+        with open(filepath, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        sys.stdout.write(text)
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Реестр страховых договоров на основе хэш-цепочки")
+    parser.add_argument("--metrics", choices=("json", "prometheus"), help="Вывести метрики после выполнения команды")
+    parser.add_argument("--metrics-file", help="Записать метрики в файл вместо стандартного вывода")
+    parser.add_argument("--profile", action="store_true", help="Профилировать команду (cProfile) и вывести отчет в stderr")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    verify_parser = subparsers.add_parser("verify", help="Проверить целостность реестра")
+    verify_parser.add_argument("ledger", help="Файл реестра")
+    verify_parser.add_argument("--full", action="store_true", help="Проверить всю цепочку, игнорируя сохраненную отметку")
+    verify_parser.add_argument("--parallel", action="store_true", help="Проверять хэши в нескольких процессах")
+    verify_parser.add_argument("--workers", type=int, help="Число процессов")
+    verify_parser.add_argument("--chunk-size", type=int, help="Число договоров в одной порции")
+
+    append_parser = subparsers.add_parser("append", help="Добавить договор в реестр")
+    append_parser.add_argument("ledger", help="Файл реестра")
+    append_parser.add_argument("--fio", required=True)
+    append_parser.add_argument("--policy-number", required=True)
+    append_parser.add_argument("--phone", default="")
+    append_parser.add_argument("--object-insured", default="")
+    append_parser.add_argument("--risk", default="")
+    append_parser.add_argument("--start-date", default="")
+    append_parser.add_argument("--end-date", default="")
+    append_parser.add_argument("--premium", default="0")
+    append_parser.add_argument("--coverage", default="0")
+    append_parser.add_argument("--agent", required=True)
+
+    stats_parser = subparsers.add_parser("stats", help="Показать сводку по реестру")
+    stats_parser.add_argument("ledger", help="Файл реестра")
+    stats_parser.add_argument("--by", choices=ReportIndex.DIMENSIONS, help="Группировка итогов")
+    stats_parser.add_argument("--start-date", help="Только договоры, действующие с даты (ДД.ММ.ГГГГ)")
+    stats_parser.add_argument("--end-date", help="Только договоры, действующие по дату (ДД.ММ.ГГГГ)")
+
+    import_parser = subparsers.add_parser("import", help="Массовый импорт договоров из CSV или JSONL")
+    import_parser.add_argument("source", help="Файл с договорами (.csv или .jsonl)")
+    import_parser.add_argument("--ledger", default="insurance_ledger.json", help="Файл реестра")
+    import_parser.add_argument("--rejects", help="CSV-файл для отклоненных строк")
+
+    segment_parser = subparsers.add_parser("segment", help="Разбить реестр на запечатанные сегменты")
+    segment_parser.add_argument("source", help="Исходный файл реестра")
+    segment_parser.add_argument("destination", help="Каталог сегментированного реестра")
+    segment_parser.add_argument("--segment-size", type=int, help="Число договоров в сегменте")
+
+    args = parser.parse_args(argv)
+    commands = {"verify": run_verify, "append": run_append, "stats": run_stats,
+                "import": run_import, "segment": run_segment}
+    if args.profile:
+        METRICS.start_profile()
+    try:
+        return commands[args.command](args)
+    finally:
+        if args.profile:
+            print(METRICS.stop_profile(), file=sys.stderr)
+        if args.metrics or args.metrics_file:
+            dump_metrics(args.metrics or "json", args.metrics_file)
+
+if __name__ == '__main__':
+    sys.exit(main())
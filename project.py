@@ -1,70 +1,28 @@
-import hashlib
-import datetime
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import json
 import os
+import queue
+import sys
+import threading
 
-class InsuranceContract:
-    def __init__(self, fio, policy_number, phone, object_insured, risk, 
-                 start_date, end_date, premium, coverage, agent, previous_hash='0', timestamp=None):
-        self.fio = fio
-        self.policy_number = policy_number
-        self.phone = phone
-        self.object_insured = object_insured
-        self.risk = risk
-        self.start_date = start_date
-        self.end_date = end_date
-        self.premium = float(premium)
-        self.coverage = float(coverage)
-        self.agent = agent
-        self.timestamp = timestamp if timestamp is not None else datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.previous_hash = previous_hash
-        self.current_hash = self.calculate_hash()
-
-    def calculate_hash(self):
-        premium_str = f"{self.premium:.2f}"
-        coverage_str = f"{self.coverage:.2f}"
-        block_string = (f"{self.fio}{self.policy_number}{self.phone}"
-                        f"{self.object_insured}{self.risk}{self.start_date}{self.end_date}"
-                        f"{premium_str}{coverage_str}{self.agent}{self.timestamp}"
-                        f"{self.previous_hash}")
-        return hashlib.sha256(block_string.encode()).hexdigest()
-
-class HashChainDB:
-    def __init__(self):
-        self.chain = [self.create_genesis_block()]
-
-    def create_genesis_block(self):
-        return InsuranceContract("Genesis", "N/A", "N/A", "N/A", "N/A", "N/A", "N/A", 0, 0, "N/A", "0", timestamp="2025-01-01 00:00:00")
-
-    def get_last_contract(self):
-        return self.chain[-1]
-    
-    def is_policy_number_unique(self, policy_number):
-        return not any(contract.policy_number == policy_number for contract in self.chain[1:])
-
-    def add_contract(self, *args, **kwargs):
-        previous_hash = self.get_last_contract().current_hash
-        new_contract = InsuranceContract(*args, **kwargs, previous_hash=previous_hash)
-        self.chain.append(new_contract)
-        return new_contract
-
-    def is_chain_valid(self):
-        for i in range(1, len(self.chain)):
-            current_contract = self.chain[i]
-            previous_contract = self.chain[i - 1]
-            if current_contract.current_hash != current_contract.calculate_hash():
-                return False, i
-            if current_contract.previous_hash != previous_contract.current_hash:
-                return False, i
-        return True, -1
+from ledger import (
+    AGENT_VALUES, METRICS, OBJECT_VALUES, RISK_VALUES, HashChainDB, OperationCancelled,
+    contract_row_values, main as ledger_main, parse_amount, timed
+)
 
 class App:
+    ROW_HEIGHT = 30
+    POLL_INTERVAL_MS = 16
+    BACKGROUND_VALIDATION_THRESHOLD = 5000
+
     def __init__(self, root):
         self.db = HashChainDB()
         self.filename = "insurance_ledger.json"
         self.is_dirty = False
+        self.task_label = None
+        self.task_cancel = None
+        self.task_queue = None
+        self.table_frozen = False
         self.root = root
         self.root.title("Система страхования")
         self.root.geometry("1920x1080")
@@ -103,33 +61,14 @@ class App:
             "end_date": "Дата окончания (ДД.ММ.ГГГГ):", "premium": "Стоимость, руб.:",
             "coverage": "Сумма покрытия, руб.:", "agent": "Агент:"
         }
-        
-        object_values = [
-            'Квартира', 'Дом', 'Дача', 'Коммерческая недвижимость', 'Земельный участок',
-            'Автомобиль легковой', 'Автомобиль грузовой', 'Мотоцикл', 'Спецтехника',
-            'Смартфон', 'Ноутбук', 'Телевизор', 'Фотоаппарат', 'Бытовая техника',
-            'Туристическая поездка', 'Авиабилеты', 'Круиз', 'Багаж',
-            'Жизнь и здоровье', 'От несчастных случаев', 'ДМС',
-            'Гражданская ответственность', 'Профессиональная ответственность',
-            'Драгоценности', 'Произведение искусства', 'Антиквариат'
-        ]
-        risk_values = [
-            'Затопление', 'Пожар', 'Кража со взломом', 'Противоправные действия третьих лиц', 'Стихийное бедствие',
-            'ДТП по своей вине', 'ДТП не по своей вине', 'Угон', 'Хищение',
-            'Механическое повреждение', 'Поломка', 'Производственный брак', 'Гарантийный случай',
-            'Утеря багажа', 'Задержка рейса', 'Отмена поездки', 'Медицинские расходы за рубежом', 'Невыезд',
-            'Травма', 'Инвалидность', 'Временная нетрудоспособность',
-            'Причинение вреда соседям', 'Врачебная ошибка', 'Ошибка юриста'
-        ]
-        agent_values = ['Иванов И.И.', 'Петров П.П.', 'Сидорова А.А.', 'Кузнецов М.В.']
-        
+
         for key, text in fields.items():
             label = tk.Label(input_fields_frame, text=text, font=("Arial", 11), bg=self.SIDEBAR_BG, fg=self.TEXT_COLOR)
             label.pack(fill='x', pady=(8, 2), anchor="w")
             
-            if key == "object_insured": entry = ttk.Combobox(input_fields_frame, font=("Arial", 10), values=object_values)
-            elif key == "risk": entry = ttk.Combobox(input_fields_frame, font=("Arial", 10), values=risk_values)
-            elif key == "agent": entry = ttk.Combobox(input_fields_frame, font=("Arial", 10), values=agent_values)
+            if key == "object_insured": entry = ttk.Combobox(input_fields_frame, font=("Arial", 10), values=OBJECT_VALUES)
+            elif key == "risk": entry = ttk.Combobox(input_fields_frame, font=("Arial", 10), values=RISK_VALUES)
+            elif key == "agent": entry = ttk.Combobox(input_fields_frame, font=("Arial", 10), values=AGENT_VALUES)
             else: entry = ttk.Entry(input_fields_frame, font=("Arial", 10))
             
             entry.pack(fill='x')
@@ -151,8 +90,11 @@ class App:
         self.tree = self.create_treeview(content_frame)
         self.tree.bind("<Double-1>", self.open_tamper_window)
 
-        self.status_bar = tk.Label(root, text="Загрузка...", bd=1, relief=tk.SUNKEN, anchor=tk.W, bg="#263238", fg="#ECEFF1", font=("Arial", 9))
+        self.status_bar = tk.Label(root, text="Загрузка...", bd=1, relief=tk.SUNKEN, anchor=tk.W, bg="#263238", fg="#ECEFF1", font=("Arial", 9), cursor="hand2")
         self.status_bar.grid(row=1, column=0, columnspan=2, sticky='we')
+        self.status_bar.bind("<Button-1>", self.open_metrics_window)
+        self.cancel_button = tk.Button(root, text="Отмена", command=self.cancel_background_task, bd=0, bg="#37474F", fg="#ECEFF1", font=("Arial", 9), padx=10)
+        self.root.bind("<Escape>", self.cancel_background_task)
         
         self.load_from_filepath(self.filename, is_initial_load=True)
 
@@ -160,7 +102,7 @@ class App:
         tree_frame = tk.Frame(parent, bg=self.MAIN_BG)
         tree_frame.pack(padx=20, pady=20, fill="both", expand=True)
         self.style.configure("Treeview.Heading", font=("Arial", 11, "bold"), padding=10)
-        self.style.configure("Treeview", rowheight=30, font=("Arial", 10), fieldbackground=self.MAIN_BG)
+        self.style.configure("Treeview", rowheight=self.ROW_HEIGHT, font=("Arial", 10), fieldbackground=self.MAIN_BG)
         self.style.map("Treeview", background=[('selected', self.ACCENT_COLOR)])
         
         columns = ('id', 'fio', 'policy', 'phone', 'object', 'risk', 'period', 'premium', 'coverage', 'agent', 'curr_hash')
@@ -183,17 +125,187 @@ class App:
         tree.tag_configure('evenrow', background='#FFFFFF')
         tree.tag_configure('tampered', background='#FFCDD2', foreground='#B71C1C', font=("Arial", 10, "bold"))
 
-        v_scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=tree.yview)
+        self.table_offset = 0
+        self.row_items = []
+        self.rendered_rows = []
+        self.invalid_index = None
+        self.selected_contract_id = None
+
+        self.v_scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.on_table_scroll)
         h_scrollbar = ttk.Scrollbar(tree_frame, orient="horizontal", command=tree.xview)
-        tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
+        tree.configure(xscrollcommand=h_scrollbar.set)
 
-        v_scrollbar.pack(side="right", fill="y")
+        self.v_scrollbar.pack(side="right", fill="y")
         h_scrollbar.pack(side="bottom", fill="x")
         tree.pack(side="left", fill="both", expand=True)
 
+        tree.bind("<Configure>", lambda event: self.render_visible_rows())
+        tree.bind("<MouseWheel>", self.on_table_mousewheel)
+        tree.bind("<Button-4>", self.on_table_mousewheel)
+        tree.bind("<Button-5>", self.on_table_mousewheel)
+        tree.bind("<Up>", self.on_table_arrow_key)
+        tree.bind("<Down>", self.on_table_arrow_key)
+        tree.bind("<Prior>", lambda event: self.on_table_scroll("scroll", -1, "pages") or "break")
+        tree.bind("<Next>", lambda event: self.on_table_scroll("scroll", 1, "pages") or "break")
+        tree.bind("<<TreeviewSelect>>", self.on_table_select)
+
         return tree
+
+    def visible_row_count(self):
+        height = self.tree.winfo_height()
+        if height <= 1:
+            return 40
+        header_height = 40
+        if self.row_items:
+            bbox = self.tree.bbox(self.row_items[0])
+            if bbox:
+                header_height = bbox[1]
+        return max(1, (height - header_height) // self.ROW_HEIGHT)
+
+    def row_tag(self, contract_id):
+        if self.invalid_index is not None and contract_id >= self.invalid_index:
+            return 'tampered'
+        return 'evenrow' if contract_id % 2 == 1 else 'oddrow'
+
+    @timed("render_rows")
+    def render_visible_rows(self):
+        if self.table_frozen:
+            return
+        total = len(self.db.chain) - 1
+        count = min(self.visible_row_count(), total)
+        self.table_offset = max(0, min(self.table_offset, total - count))
+
+        while len(self.row_items) < count:
+            self.row_items.append(self.tree.insert('', 'end'))
+            self.rendered_rows.append(None)
+        while len(self.row_items) > count:
+            self.tree.delete(self.row_items.pop())
+            self.rendered_rows.pop()
+
+        selected_items = []
+        for slot, item_id in enumerate(self.row_items):
+            contract_id = self.table_offset + slot + 1
+            row = (contract_row_values(contract_id, self.db.chain[contract_id]), self.row_tag(contract_id))
+            if row != self.rendered_rows[slot]:
+                self.tree.item(item_id, values=row[0], tags=(row[1],))
+                self.rendered_rows[slot] = row
+            if contract_id == self.selected_contract_id:
+                selected_items.append(item_id)
+
+        if tuple(selected_items) != self.tree.selection():
+            self.tree.selection_set(selected_items)
+        if selected_items:
+            self.tree.focus(selected_items[0])
+
+        if total:
+            self.v_scrollbar.set(self.table_offset / total, (self.table_offset + count) / total)
+        else:
+            self.v_scrollbar.set(0, 1)
+
+    def on_table_scroll(self, action, value, unit=None):
+        if action == "moveto":
+            self.table_offset = int(float(value) * (len(self.db.chain) - 1))
+        elif action == "scroll":
+            step = max(1, len(self.row_items) - 1) if unit == "pages" else 1
+            self.table_offset += int(value) * step
+        self.render_visible_rows()
+
+    def on_table_mousewheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.on_table_scroll("scroll", -3)
+        else:
+            self.on_table_scroll("scroll", 3)
+        return "break"
+
+    def on_table_arrow_key(self, event):
+        focused_item = self.tree.focus()
+        if focused_item not in self.row_items:
+            return None
+        step = -1 if event.keysym == "Up" else 1
+        if 0 <= self.row_items.index(focused_item) + step < len(self.row_items):
+            return None
+        contract_id = self.table_offset + self.row_items.index(focused_item) + 1 + step
+        if 1 <= contract_id < len(self.db.chain):
+            self.selected_contract_id = contract_id
+            self.on_table_scroll("scroll", step)
+        return "break"
+
+    def on_table_select(self, event=None):
+        selection = self.tree.selection()
+        if selection and selection[0] in self.row_items:
+            self.selected_contract_id = self.table_offset + self.row_items.index(selection[0]) + 1
     
+    def run_in_background(self, label, task, on_done, on_error=None, on_cancel=None, freeze_table=False):
+        if self.task_cancel is not None:
+            return False
+        results = queue.Queue()
+        cancel = threading.Event()
+
+        def worker():
+            try:
+                results.put(("done", task(lambda done, total: results.put(("progress", done, total)), cancel)))
+            except OperationCancelled:
+                results.put(("cancelled",))
+            except Exception as e:
+                results.put(("error", e))
+
+        self.task_label = label
+        self.task_cancel = cancel
+        self.task_queue = results
+        self.table_frozen = freeze_table
+        self.status_bar.config(text=f"{label}... (Esc — отмена)")
+        self.cancel_button.grid(row=1, column=1, sticky="e")
+        threading.Thread(target=worker, daemon=True).start()
+        self.root.after(self.POLL_INTERVAL_MS, self.poll_background_task, on_done, on_error, on_cancel)
+        return True
+
+    def poll_background_task(self, on_done, on_error, on_cancel):
+        progress = None
+        while True:
+            try:
+                message = self.task_queue.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == "progress":
+                progress = message[1:]
+                continue
+            self.finish_background_task()
+            if message[0] == "done":
+                on_done(message[1])
+            elif message[0] == "error" and on_error is not None:
+                on_error(message[1])
+            elif message[0] == "cancelled" and on_cancel is not None:
+                on_cancel()
+            else:
+                self.render_visible_rows()
+                self.update_status()
+            return
+        if progress is not None:
+            done, total = progress
+            percent = 100 * done // total if total else 0
+            self.status_bar.config(text=f"{self.task_label}: {percent}% ({done} из {total}) (Esc — отмена)")
+        self.root.after(self.POLL_INTERVAL_MS, self.poll_background_task, on_done, on_error, on_cancel)
+
+    def finish_background_task(self):
+        self.task_label = None
+        self.task_cancel = None
+        self.task_queue = None
+        self.table_frozen = False
+        self.cancel_button.grid_remove()
+
+    def cancel_background_task(self, event=None):
+        if self.task_cancel is not None:
+            self.task_cancel.set()
+            self.status_bar.config(text=f"{self.task_label}: отмена...")
+
+    def ensure_idle(self):
+        if self.task_cancel is None:
+            return True
+        messagebox.showinfo("Подождите", f"Дождитесь завершения операции: {self.task_label}.")
+        return False
+
     def open_tamper_window(self, event=None):
+        if not self.ensure_idle(): return
         selected_item_id = self.tree.focus()
         if not selected_item_id: return
         item_values = self.tree.item(selected_item_id, "values")
@@ -232,10 +344,10 @@ class App:
                 new_value = entry.get()
                 try:
                     if key in ["premium", "coverage"]: 
-                        new_value = float(new_value) if new_value else 0.0
+                        new_value = parse_amount(new_value)
                 except ValueError: 
                     new_value = getattr(contract, key)
-                setattr(contract, key, new_value)
+                self.db.update_contract(contract_id, key, new_value)
             
             self.is_dirty = True
             self.update_table()
@@ -245,6 +357,7 @@ class App:
         ttk.Button(frame, text="Сохранить изменения (взлом)", command=save_tampered_data, style="Accent.TButton").pack(pady=20, ipady=4)
 
     def add_contract_gui(self):
+        if not self.ensure_idle(): return
         try:
             data = {key: entry.get() for key, entry in self.entries.items()}
             if not data["fio"] or not data["policy_number"] or not data["agent"]:
@@ -254,8 +367,8 @@ class App:
                 messagebox.showerror("Ошибка ввода", f"Номер полиса '{data['policy_number']}' уже существует!")
                 return
                 
-            premium = float(data.get("premium") or 0)
-            coverage = float(data.get("coverage") or 0)
+            premium = parse_amount(data.get("premium"))
+            coverage = parse_amount(data.get("coverage"))
             
             self.db.add_contract(
                 data["fio"], data["policy_number"], data["phone"], data["object_insured"], 
@@ -267,25 +380,38 @@ class App:
             for entry in self.entries.values():
                 if isinstance(entry, ttk.Entry): entry.delete(0, 'end')
                 else: entry.set('')
-        except ValueError:
-            messagebox.showerror("Ошибка ввода", "Стоимость и Сумма покрытия должны быть числами!")
+        except ValueError as e:
+            messagebox.showerror("Ошибка ввода", f"{e}!")
 
     def validate_chain_gui(self):
-        is_valid, error_index = self.db.is_chain_valid()
+        if not self.ensure_idle(): return
+
+        def audit(progress, cancel):
+            if len(self.db.chain) > self.db.PARALLEL_VERIFY_THRESHOLD:
+                is_valid, error_index = self.db.is_chain_valid_parallel(full=True, progress=progress, cancel=cancel)
+            else:
+                is_valid, error_index = self.db.is_chain_valid(full=True, progress=progress, cancel=cancel)
+            tampered_ids = [] if is_valid else [index for index in self.db.find_tampered_indices(progress, cancel) if index > 0]
+            return is_valid, error_index, tampered_ids
+
+        self.run_in_background("Проверка целостности", audit, self.on_chain_validated)
+
+    def on_chain_validated(self, result):
+        is_valid, error_index, tampered_ids = result
+        self.mark_invalid_rows((is_valid, error_index))
         if is_valid:
             messagebox.showinfo("Проверка успешна", "ЦЕЛОСТНОСТЬ ПОДТВЕРЖДЕНА! Все записи в базе данных верны.", icon='info')
         else:
-            self.show_tamper_analysis(error_index)
-            self.update_table()
+            self.show_tamper_analysis(error_index, tampered_ids)
             
-    def show_tamper_analysis(self, error_index):
+    def show_tamper_analysis(self, error_index, tampered_ids):
         tampered_contract = self.db.chain[error_index]
         recalculated_hash = tampered_contract.calculate_hash()
         stored_hash = tampered_contract.current_hash
         
         analysis_window = tk.Toplevel(self.root)
         analysis_window.title("Анализ нарушения целостности")
-        analysis_window.geometry("1000x300")
+        analysis_window.geometry("1000x360")
         analysis_window.transient(self.root)
         analysis_window.grab_set()
         
@@ -305,55 +431,133 @@ class App:
         tk.Label(hash_frame, text="Рассчитанный хэш:", font=("Arial", 11, "bold"), fg="red").grid(row=1, column=0, sticky='w', pady=(5,0))
         tk.Label(hash_frame, text=recalculated_hash, font=("Courier", 11, "bold"), fg="red").grid(row=1, column=1, sticky='w', padx=10, pady=(5,0))
 
+        if tampered_ids:
+            ids_text = ", ".join(str(index) for index in tampered_ids[:20])
+            if len(tampered_ids) > 20: ids_text += f" и еще {len(tampered_ids) - 20}"
+            tk.Label(frame, text=f"Измененные записи ({len(tampered_ids)}): {ids_text}", font=("Arial", 11), wraplength=940, justify="left").pack(anchor="w", pady=(15, 0))
+
+    @timed("update_table")
     def update_table(self):
-        self.tree.delete(*self.tree.get_children())
-        is_chain_valid, invalid_index = self.db.is_chain_valid()
-        for i, contract in enumerate(self.db.chain[1:]):
-            current_id = i + 1
-            tag = 'evenrow' if i % 2 == 0 else 'oddrow'
-            if not is_chain_valid and current_id >= invalid_index:
-                tag = 'tampered'
-            
-            period = f"{contract.start_date} - {contract.end_date}"
-            
-            self.tree.insert('', 'end', values=(
-                current_id, contract.fio, contract.policy_number, contract.phone, contract.object_insured, 
-                contract.risk, period, f"{contract.premium:.2f}", f"{contract.coverage:.2f}",
-                contract.agent, contract.current_hash
-            ), tags=(tag,))
-        
+        if len(self.db.chain) - 1 - self.db.verified_up_to > self.BACKGROUND_VALIDATION_THRESHOLD:
+            self.render_visible_rows()
+            self.update_status()
+            self.run_in_background(
+                "Проверка целостности",
+                lambda progress, cancel: self.db.is_chain_valid(progress=progress, cancel=cancel),
+                self.mark_invalid_rows
+            )
+            return
+        self.mark_invalid_rows(self.db.is_chain_valid())
+
+    def mark_invalid_rows(self, result):
+        is_chain_valid, invalid_index = result
+        self.invalid_index = None if is_chain_valid else invalid_index
+        self.render_visible_rows()
+        self.update_status()
+        if not self.is_dirty and self.filename and self.db.saved_count == len(self.db.chain) - 1:
+            try:
+                self.db.save_checkpoint(self.filename)
+            except OSError:
+                pass
+
+    def update_status(self):
         count = len(self.db.chain) - 1
         filename_text = os.path.basename(self.filename) if self.filename else "Новый файл"
         status_text = f"Всего договоров: {count} | Файл: {filename_text}"
         if self.is_dirty: status_text += " (есть несохраненные изменения)"
         self.status_bar.config(text=status_text)
 
-    def save_to_filepath(self, filepath):
-        data_to_save = [vars(contract) for contract in self.db.chain[1:]]
-        try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data_to_save, f, ensure_ascii=False, indent=4)
+    def open_metrics_window(self, event=None):
+        metrics_window = tk.Toplevel(self.root)
+        metrics_window.title("Метрики производительности")
+        metrics_window.geometry("900x600")
+        metrics_window.transient(self.root)
+
+        toolbar = tk.Frame(metrics_window, padx=10, pady=10)
+        toolbar.pack(fill="x")
+        text_frame = tk.Frame(metrics_window, padx=10)
+        text_frame.pack(fill="both", expand=True, pady=(0, 10))
+        text = tk.Text(text_frame, font=("Courier", 10), wrap="none")
+        scrollbar = ttk.Scrollbar(text_frame, orient="vertical", command=text.yview)
+        text.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        text.pack(side="left", fill="both", expand=True)
+
+        metrics_format = tk.StringVar(value="json")
+        profile_button = ttk.Button(toolbar)
+
+        def refresh():
+            content = METRICS.export(metrics_format.get())
+            if METRICS.last_profile and not METRICS.is_profiling:
+                content += "\n" + METRICS.last_profile
+            text.configure(state="normal")
+            text.delete("1.0", "end")
+            text.insert("1.0", content)
+            text.configure(state="disabled")
+            profile_button.configure(text="Остановить профилирование" if METRICS.is_profiling else "Начать профилирование")
+
+        def toggle_profile():
+            if METRICS.is_profiling:
+                if not self.ensure_idle(): return
+                METRICS.stop_profile()
+            else:
+                METRICS.start_profile()
+            refresh()
+
+        def export_metrics():
+            fmt = metrics_format.get()
+            filepath = filedialog.asksaveasfilename(
+                parent=metrics_window,
+                defaultextension=".json" if fmt == "json" else ".prom",
+                filetypes=[("JSON Files", "*.json"), ("Prometheus", "*.prom"), ("All Files", "*.*")],
+                title="Экспорт метрик"
+            )
+            if filepath:
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    f.write(METRICS.export(fmt))
+
+        ttk.Radiobutton(toolbar, text="JSON", value="json", variable=metrics_format, command=refresh).pack(side="left")
+        ttk.Radiobutton(toolbar, text="Prometheus", value="prometheus", variable=metrics_format, command=refresh).pack(side="left", padx=(10, 20))
+        ttk.Button(toolbar, text="Обновить", command=refresh).pack(side="left")
+        profile_button.configure(command=toggle_profile)
+        profile_button.pack(side="left", padx=10)
+        ttk.Button(toolbar, text="Экспорт...", command=export_metrics).pack(side="left")
+        refresh()
+
+    def save_to_filepath(self, filepath, on_saved=None):
+        def save(progress, cancel):
+            self.db.save_to_filepath(filepath, progress=progress, cancel=cancel)
+            self.db.save_checkpoint(filepath)
+
+        def on_done(result):
             self.filename = filepath
             self.is_dirty = False
             self.update_table()
             messagebox.showinfo("Сохранение", f"Данные успешно сохранены в файл:\n{filepath}")
-        except Exception as e:
+            if on_saved is not None:
+                on_saved()
+
+        def on_error(e):
+            self.update_table()
             messagebox.showerror("Ошибка сохранения", f"Не удалось сохранить данные: {e}")
 
-    def save_file(self):
+        self.run_in_background("Сохранение", save, on_done, on_error, freeze_table=True)
+
+    def save_file(self, on_saved=None):
+        if not self.ensure_idle(): return
         if self.filename:
-            self.save_to_filepath(self.filename)
+            self.save_to_filepath(self.filename, on_saved)
         else:
-            self.save_file_as()
+            self.save_file_as(on_saved)
             
-    def save_file_as(self):
+    def save_file_as(self, on_saved=None):
         filepath = filedialog.asksaveasfilename(
             defaultextension=".json",
-            filetypes=[("JSON Files", "*.json"), ("All Files", "*.*")],
+            filetypes=[("JSON Files", "*.json"), ("JSON Lines", "*.jsonl"), ("All Files", "*.*")],
             title="Сохранить файл как..."
         )
         if filepath:
-            self.save_to_filepath(filepath)
+            self.save_to_filepath(filepath, on_saved)
     
     def load_from_filepath(self, filepath, is_initial_load=False):
         if not os.path.exists(filepath):
@@ -361,42 +565,54 @@ class App:
                 messagebox.showerror("Ошибка", f"Файл не найден: {filepath}")
             self.update_table()
             return
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                loaded_data = json.load(f)
-            
-            self.db.chain = [self.db.create_genesis_block()]
-            
-            for item in loaded_data:
-                recreated_contract = InsuranceContract(
-                    item.get('fio', ''), item.get('policy_number', ''), item.get('phone', ''), 
-                    item.get('object_insured', ''), item.get('risk', ''), item.get('start_date', ''), 
-                    item.get('end_date', ''), item.get('premium', 0.0), item.get('coverage', 0.0), item.get('agent', 'N/A'),
-                    previous_hash=item.get('previous_hash'), timestamp=item.get('timestamp')
-                )
-                recreated_contract.current_hash = item.get('current_hash') 
-                self.db.chain.append(recreated_contract)
-            
+        def load(progress, cancel):
+            db = HashChainDB()
+            db.load_from_filepath(filepath, progress=progress, cancel=cancel)
+            try:
+                db.get_policy_index(progress, cancel)
+            except OperationCancelled:
+                db.close()
+                raise
+            return db
+
+        def on_done(db):
+            self.db.close()
+            self.db = db
             self.filename = filepath
-            self.is_dirty = False
+            self.is_dirty = bool(self.db.recovered_bytes)
+            self.table_offset = 0
+            self.selected_contract_id = None
             self.update_table()
-        except Exception as e:
+            if self.db.recovered_bytes:
+                messagebox.showwarning("Восстановление", f"Файл был сохранен не полностью. Незавершенный хвост ({self.db.recovered_bytes} байт) отброшен.")
+
+        def on_error(e):
             if not is_initial_load:
                 messagebox.showerror("Ошибка загрузки", f"Не удалось загрузить данные из файла: {e}")
-            else:
-                self.update_table()
+            self.update_table()
+
+        def on_cancel():
+            self.filename = None
+            self.update_table()
+
+        self.run_in_background("Загрузка", load, on_done, on_error, on_cancel)
 
     def on_closing(self):
+        if self.task_cancel is not None:
+            self.cancel_background_task()
+            self.root.after(self.POLL_INTERVAL_MS, self.on_closing)
+            return
         if self.is_dirty:
             response = messagebox.askyesnocancel("Выход", "У вас есть несохраненные изменения. Сохранить их перед выходом?")
             if response is True: 
-                self.save_file()
-                if not self.is_dirty: self.root.destroy()
+                self.save_file(on_saved=self.root.destroy)
             elif response is False: self.root.destroy()
         else:
             self.root.destroy()
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        sys.exit(ledger_main())
     root = tk.Tk()
     app = App(root)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,45 @@
+import json
+
+from ledger import HashChainDB
+
+STORAGES = ("compact", "list", "mapped")
+
+
+def add_contracts(db, count, first_number=1):
+    for number in range(first_number, first_number + count):
+        db.add_contract(f"Иванов И.И. {number}", f"P{number:05d}", "+375290000000", "Квартира", "Пожар",
+                        "01.01.2025", "01.01.2026", 100.0 + number, 1000.0, "Петров П.П.",
+                        timestamp="2025-01-01 09:00:00")
+
+
+def write_ledger(filepath, batches):
+    db = HashChainDB()
+    first_number = 1
+    for count in batches:
+        add_contracts(db, count, first_number)
+        first_number += count
+        db.save_to_filepath(str(filepath))
+    return db
+
+
+def load(filepath, storage="compact"):
+    db = HashChainDB(storage=storage)
+    db.load_from_filepath(str(filepath))
+    return db
+
+
+def rewrite_record(filepath, line_index, **changes):
+    lines = filepath.read_bytes().split(b"\n")
+    item = json.loads(lines[line_index])
+    item.update(changes)
+    lines[line_index] = json.dumps(item, ensure_ascii=False).encode('utf-8')
+    filepath.write_bytes(b"\n".join(lines))
+
+
+def make_segmented(tmp_path, count=25, segment_size=10):
+    source = tmp_path / "source.jsonl"
+    directory = tmp_path / "segments"
+    db = write_ledger(source, [count])
+    db.segment_ledger(str(directory), segment_size)
+    db.save_checkpoint(str(directory))
+    return directory
@@ -0,0 +1,103 @@
+import json
+import os
+
+import pytest
+
+from helpers import STORAGES, add_contracts, load, make_segmented, write_ledger
+from ledger import METRICS, HashChainDB, main
+
+
+def test_watermark_follows_appends_and_edits():
+    db = HashChainDB()
+    add_contracts(db, 5)
+    assert db.verified_up_to == 5
+    assert db.is_chain_valid() == (True, -1)
+
+    db.update_contract(3, "fio", "Взлом")
+    assert db.verified_up_to == 2
+    add_contracts(db, 1, 100)
+    assert db.verified_up_to == 2
+    assert db.is_chain_valid() == (False, 3)
+    assert db.verified_up_to == 2
+
+    db.update_contract(3, "fio", "Иванов И.И. 3")
+    assert db.is_chain_valid() == (True, -1)
+    assert db.verified_up_to == 6
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_checkpoint_skips_verified_prefix(tmp_path, storage):
+    ledger = tmp_path / "ledger.jsonl"
+    write_ledger(ledger, [30])
+    db = load(ledger, storage)
+    assert db.verified_up_to == 0
+    assert db.is_chain_valid() == (True, -1)
+    db.save_checkpoint(str(ledger))
+    db.close()
+
+    db = load(ledger, storage)
+    assert db.verified_up_to == 30
+    hashes = METRICS.counters["hashes_computed"]
+    assert db.is_chain_valid() == (True, -1)
+    assert METRICS.counters["hashes_computed"] == hashes
+    db.close()
+
+
+def test_checkpoint_is_ignored_after_file_changes(tmp_path):
+    ledger = tmp_path / "ledger.jsonl"
+    db = write_ledger(ledger, [10])
+    db.save_checkpoint(str(ledger))
+    assert load(ledger).verified_up_to == 10
+
+    add_contracts(db, 2, 100)
+    db.save_to_filepath(str(ledger))
+    assert load(ledger).verified_up_to == 0
+
+    db.save_checkpoint(str(ledger))
+    stat = os.stat(ledger)
+    os.utime(ledger, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert load(ledger).verified_up_to == 0
+
+
+@pytest.mark.parametrize("checkpoint", [
+    {"verified_up_to": 4, "hash": "0" * 64},
+    {"verified_up_to": 50},
+    {"verified_up_to": "не число"},
+])
+def test_checkpoint_is_ignored_when_it_does_not_match(tmp_path, checkpoint):
+    ledger = tmp_path / "ledger.jsonl"
+    write_ledger(ledger, [10]).save_checkpoint(str(ledger))
+    checkpoint_path = HashChainDB.checkpoint_path(str(ledger))
+    with open(checkpoint_path, 'r', encoding='utf-8') as f:
+        saved = json.load(f)
+    with open(checkpoint_path, 'w', encoding='utf-8') as f:
+        json.dump(dict(saved, **checkpoint), f)
+
+    db = load(ledger)
+    assert db.verified_up_to == 0
+    assert db.is_chain_valid() == (True, -1)
+
+
+def test_checkpoint_is_ignored_when_missing_or_broken(tmp_path):
+    ledger = tmp_path / "ledger.jsonl"
+    write_ledger(ledger, [3])
+    assert load(ledger).verified_up_to == 0
+
+    with open(HashChainDB.checkpoint_path(str(ledger)), 'w', encoding='utf-8') as f:
+        f.write("{")
+    assert load(ledger).verified_up_to == 0
+
+
+def test_segmented_checkpoint(tmp_path):
+    directory = make_segmented(tmp_path)
+    db = HashChainDB(storage="segmented")
+    db.load_segments(str(directory))
+    assert db.verified_up_to == 25
+
+
+def test_verify_command_saves_checkpoint(tmp_path, capsys):
+    ledger = tmp_path / "ledger.jsonl"
+    write_ledger(ledger, [8])
+    assert main(["verify", str(ledger)]) == 0
+    assert "8 договоров" in capsys.readouterr().out
+    assert load(ledger).verified_up_to == 8
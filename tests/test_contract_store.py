@@ -0,0 +1,83 @@
+import pytest
+
+from helpers import STORAGES, add_contracts, load, make_segmented, write_ledger
+from ledger import ContractStore, HashChainDB, InsuranceContract
+
+
+def make_store(count):
+    db = HashChainDB(storage="list")
+    add_contracts(db, count)
+    return ContractStore(db.chain)
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_contract_attribute_writes_reach_the_chain(tmp_path, storage):
+    ledger = tmp_path / "ledger.jsonl"
+    write_ledger(ledger, [5])
+    db = load(ledger, storage)
+    add_contracts(db, 2, 100)
+
+    for index in (3, 6):
+        db.chain[index].fio = "Взлом"
+        db.chain[index].premium = 1.0
+        assert db.chain[index].fio == "Взлом"
+        assert db.chain[index].premium == 1.0
+    assert set(vars(db.chain[3])) == set(vars(db.chain[0]))
+    assert db.is_chain_valid(full=True) == (False, 3)
+    db.close()
+
+
+def test_contract_attribute_writes_reach_sealed_segments(tmp_path):
+    db = load(make_segmented(tmp_path))
+    db.chain[4].fio = "Взлом"
+    db.chain[23].fio = "Взлом"
+    assert db.chain[4].fio == db.chain[23].fio == "Взлом"
+    assert db.is_chain_valid(full=True) == (False, 4)
+
+
+@pytest.mark.parametrize("key, value", [
+    ("fio", "Взлом"), ("policy_number", "P99999"), ("object_insured", "Дом"), ("start_date", "02.01.2025"),
+    ("premium", 100.004), ("coverage", 1.0), ("agent", "Новый агент"), ("timestamp", "2025-01-02 09:00:00"),
+    ("previous_hash", "0" * 64), ("previous_hash", "не хэш"), ("current_hash", "f" * 64), ("current_hash", "не хэш"),
+])
+def test_column_validation_matches_contract_validation(key, value):
+    store = make_store(12)
+    setattr(store[7], key, value)
+    reference = [InsuranceContract.from_dict(vars(contract)) for contract in store]
+
+    expected = None
+    previous_hash = reference[0].current_hash
+    for index in range(1, len(reference)):
+        contract = reference[index]
+        if contract.previous_hash != previous_hash or contract.current_hash != contract.calculate_hash():
+            expected = index
+            break
+        previous_hash = contract.current_hash
+    assert expected in (7, 8)
+    assert store.find_first_invalid(1, len(store), store[0].current_hash) == expected
+
+
+def test_column_validation_follows_raw_previous_hash():
+    store = make_store(2)
+    first = InsuranceContract("Иванов И.И.", "P1", "", "Дом", "Пожар", "", "", 1, 1, "Агент", previous_hash="не хэш")
+    second = InsuranceContract("Петров П.П.", "P2", "", "Дом", "Пожар", "", "", 1, 1, "Агент",
+                               previous_hash=first.current_hash)
+    store.extend([first, second])
+
+    assert store.find_first_invalid(3, 5, "не хэш") is None
+    assert store.find_first_invalid(3, 5, store[2].current_hash) == 3
+    assert store.find_first_invalid(1, 3, store[0].current_hash) is None
+
+
+def test_trailing_contracts_can_be_deleted():
+    store = make_store(6)
+    store.set_hash(2, 'current_hash', "не хэш")
+    store.set_hash(5, 'previous_hash', "не хэш")
+    kept = [vars(contract) for contract in store[:4]]
+
+    del store[4:]
+    assert len(store) == 4
+    assert [vars(contract) for contract in store] == kept
+    assert store.raw_hashes == {(0, 'previous_hash'): "0", (2, 'current_hash'): "не хэш"}
+    with pytest.raises(TypeError):
+        del store[::2]
@@ -0,0 +1,84 @@
+import csv
+import json
+
+from helpers import add_contracts, load
+from ledger import HashChainDB, iter_import_rows, main
+
+HEADER = "fio;policy_number;phone;object_insured;risk;start_date;end_date;premium;coverage;agent\n"
+
+
+def import_csv(tmp_path, text):
+    source = tmp_path / "source.csv"
+    source.write_text(HEADER + text, encoding='utf-8')
+    db = HashChainDB()
+    add_contracts(db, 2)
+    imported, rejected = db.import_contracts(iter_import_rows(str(source)))
+    return db, imported, rejected
+
+
+def test_csv_rejects_carry_line_and_reason(tmp_path):
+    db, imported, rejected = import_csv(tmp_path, (
+        "Сидоров С.С.;N1;;Дом;Пожар;01.01.2025;01.01.2026;1 200,50;10000;Агент\n"
+        ";N2;;Дом;Пожар;;;1;1;Агент\n"
+        "Кузнецов К.К.;P00001;;Дом;Пожар;;;1;1;Агент\n"
+        "Козлов К.К.;N1;;Дом;Пожар;;;1;1;Агент\n"
+        "Попов П.П.;N3;;Дом;Пожар;;;много;1;Агент\n"
+        "Орлов О.О.;N4;;Дом;Пожар;;;nan;1;Агент\n"
+        "Волков В.В.;N5;;Дом;Пожар;;;1;inf;Агент\n"
+        "Зайцев З.З.;N6;;Дом;Пожар;;;;;Агент\n"
+    ))
+    assert imported == 2
+    assert [line_no for line_no, _ in rejected] == [3, 4, 5, 6, 7, 8]
+    assert "обязательными" in rejected[0][1]
+    assert "P00001" in rejected[1][1]
+    assert "N1" in rejected[2][1]
+    assert "числами" in rejected[3][1]
+    assert "конечными" in rejected[4][1] and "конечными" in rejected[5][1]
+
+    assert db.chain[3].premium == 1200.5
+    assert db.chain[4].policy_number == "N6" and db.chain[4].premium == 0.0
+    assert db.get_contract_index_by_policy("N1") == 3
+    assert db.is_chain_valid(full=True) == (True, -1)
+
+
+def test_csv_line_numbers_follow_multiline_fields(tmp_path):
+    _, imported, rejected = import_csv(tmp_path, (
+        'Сидоров С.С.;N1;;"Дом,\nгараж\nи баня";Пожар;;;1;1;Агент\n'
+        ";N2;;Дом;Пожар;;;1;1;Агент\n"
+    ))
+    assert imported == 1
+    assert rejected == [(5, "ФИО, Номер полиса и Агент являются обязательными полями")]
+
+
+def test_jsonl_rejects_bad_lines(tmp_path):
+    source = tmp_path / "source.jsonl"
+    rows = [
+        json.dumps({"fio": "Сидоров С.С.", "policy_number": 7, "agent": "Агент", "premium": 5}, ensure_ascii=False),
+        "",
+        "{не json",
+        "[1, 2]",
+        json.dumps({"fio": "Попов П.П.", "policy_number": "7", "agent": "Агент"}, ensure_ascii=False),
+    ]
+    source.write_text("\n".join(rows) + "\n", encoding='utf-8')
+    db = HashChainDB()
+    imported, rejected = db.import_contracts(iter_import_rows(str(source)))
+    assert imported == 1
+    assert [line_no for line_no, _ in rejected] == [3, 4, 5]
+    assert db.chain[1].policy_number == "7"
+    assert db.chain[1].premium == 5.0
+
+
+def test_import_command_writes_rejects(tmp_path, capsys):
+    source = tmp_path / "source.csv"
+    source.write_text(HEADER + "Сидоров С.С.;N1;;Дом;Пожар;;;1;1;Агент\n;N2;;Дом;Пожар;;;1;1;Агент\n",
+                      encoding='utf-8')
+    ledger = tmp_path / "ledger.jsonl"
+    rejects = tmp_path / "rejects.csv"
+
+    assert main(["import", str(source), "--ledger", str(ledger), "--rejects", str(rejects)]) == 0
+    assert "Импортировано: 1, отклонено: 1" in capsys.readouterr().out
+    with open(rejects, 'r', encoding='utf-8', newline='') as f:
+        assert list(csv.reader(f))[1][0] == "3"
+    db = load(ledger)
+    assert db.get_contract_index_by_policy("N1") == 1
+    assert db.verified_up_to == 1
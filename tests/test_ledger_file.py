@@ -0,0 +1,106 @@
+import json
+import tracemalloc
+
+import pytest
+
+from helpers import STORAGES, add_contracts, load, rewrite_record, write_ledger
+from ledger import HashChainDB
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_torn_final_line_is_dropped(tmp_path, storage):
+    ledger = tmp_path / "ledger.jsonl"
+    write_ledger(ledger, [5, 5])
+    data = ledger.read_bytes()
+    ledger.write_bytes(data[:-200])
+
+    db = load(ledger, storage)
+    assert len(db.chain) == 6
+    assert db.recovered_bytes > 0
+    assert db.is_chain_valid(full=True) == (True, -1)
+
+    add_contracts(db, 1, 100)
+    db.save_to_filepath(str(ledger))
+    db.close()
+    reloaded = load(ledger, storage)
+    assert len(reloaded.chain) == 7
+    assert reloaded.recovered_bytes == 0
+    assert reloaded.is_chain_valid(full=True) == (True, -1)
+    reloaded.close()
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_batch_without_commit_at_end_is_dropped(tmp_path, storage):
+    ledger = tmp_path / "ledger.jsonl"
+    write_ledger(ledger, [5, 5])
+    lines = ledger.read_bytes().split(b"\n")
+    ledger.write_bytes(b"\n".join(lines[:-2]) + b"\n")
+
+    db = load(ledger, storage)
+    assert len(db.chain) == 6
+    assert db.recovered_bytes > 0
+    db.close()
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+@pytest.mark.parametrize("line_index", [3, 6])
+def test_corruption_before_end_is_an_error(tmp_path, storage, line_index):
+    ledger = tmp_path / "ledger.jsonl"
+    write_ledger(ledger, [5, 5])
+    lines = ledger.read_bytes().split(b"\n")
+    lines[line_index] = lines[line_index][:-1]
+    ledger.write_bytes(b"\n".join(lines))
+    before = ledger.read_bytes()
+
+    with pytest.raises(ValueError):
+        load(ledger, storage)
+    assert ledger.read_bytes() == before
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_wrong_commit_marker_before_end_is_an_error(tmp_path, storage):
+    ledger = tmp_path / "ledger.jsonl"
+    write_ledger(ledger, [5, 5])
+    rewrite_record(ledger, 6, commit=4)
+
+    with pytest.raises(ValueError):
+        load(ledger, storage)
+
+
+def test_legacy_array_corruption_is_an_error(tmp_path):
+    ledger = tmp_path / "ledger.json"
+    db = HashChainDB()
+    add_contracts(db, 3)
+    ledger.write_text(json.dumps([vars(contract) for contract in db.chain])[:-40], encoding='utf-8')
+
+    with pytest.raises(ValueError):
+        load(ledger)
+
+
+def test_append_save_refuses_file_changed_on_disk(tmp_path):
+    ledger = tmp_path / "ledger.jsonl"
+    write_ledger(ledger, [3])
+    db = load(ledger)
+    with open(ledger, 'ab') as f:
+        f.write(b'{"fio": "external"}\n')
+    before = ledger.read_bytes()
+
+    add_contracts(db, 1, 100)
+    with pytest.raises(ValueError):
+        db.save_to_filepath(str(ledger))
+    assert ledger.read_bytes() == before
+
+
+@pytest.mark.parametrize("storage", ("compact", "list"))
+def test_load_does_not_buffer_parsed_records(tmp_path, storage):
+    ledger = tmp_path / "ledger.jsonl"
+    write_ledger(ledger, [3000])
+
+    tracemalloc.start()
+    try:
+        db = load(ledger, storage)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert len(db.chain) == 3001
+    assert peak < 1.5 * current
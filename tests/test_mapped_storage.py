@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+
+from helpers import STORAGES, add_contracts, load, rewrite_record, write_ledger
+from ledger import PROGRESS_INTERVAL, OperationCancelled
+
+
+@pytest.mark.parametrize("line_index, expected", [(0, (True, -1)), (1, (False, 1)), (4, (False, 4)), (9, (False, 8))])
+def test_storage_modes_agree(tmp_path, line_index, expected):
+    ledger = tmp_path / "ledger.jsonl"
+    write_ledger(ledger, [4, 4])
+    if line_index:
+        rewrite_record(ledger, line_index, fio="Взлом")
+
+    results = []
+    for storage in STORAGES:
+        db = load(ledger, storage)
+        results.append((len(db.chain), db.is_chain_valid(full=True)))
+        db.close()
+    assert results == [(9, expected)] * len(STORAGES)
+
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_policy_index_scan_sees_edits_and_tail(tmp_path, storage):
+    ledger = tmp_path / "ledger.jsonl"
+    write_ledger(ledger, [5, 5])
+    db = load(ledger, storage)
+    add_contracts(db, 2, 100)
+    db.update_contract(3, "policy_number", "NEW")
+
+    db.policy_index = None
+    assert db.get_policy_index() == {
+        **{f"P{i:05d}": i for i in (1, 2, 4, 5, 6, 7, 8, 9, 10)}, "NEW": 3, "P00100": 11, "P00101": 12,
+    }
+    db.close()
+
+
+def test_policy_index_build_reports_progress_and_cancels(tmp_path):
+    ledger = tmp_path / "ledger.jsonl"
+    write_ledger(ledger, [PROGRESS_INTERVAL + 10])
+    db = load(ledger, "mapped")
+    assert db.policy_index is None
+
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(OperationCancelled):
+        db.get_policy_index(cancel=cancel)
+    assert db.policy_index is None
+
+    reports = []
+    db.get_policy_index(lambda done, total: reports.append((done, total)))
+    assert reports == [(0, PROGRESS_INTERVAL + 11), (PROGRESS_INTERVAL, PROGRESS_INTERVAL + 11)]
+    assert db.get_contract_index_by_policy(f"P{PROGRESS_INTERVAL:05d}") == PROGRESS_INTERVAL
+    db.close()
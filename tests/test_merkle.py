@@ -0,0 +1,96 @@
+import hashlib
+
+import pytest
+
+from helpers import STORAGES, add_contracts, load, rewrite_record, write_ledger
+from ledger import METRICS, HashChainDB, MerkleTree
+
+
+def leaves(count):
+    return [hashlib.sha256(str(i).encode()).digest() for i in range(count)]
+
+
+@pytest.mark.parametrize("count", [1, 2, 5, 8, 13])
+def test_incremental_tree_matches_rebuild(count):
+    tree = MerkleTree()
+    for leaf in leaves(count):
+        tree.append(leaf)
+    tree.update(count // 2, b"\x01" * 32)
+    expected = leaves(count)
+    expected[count // 2] = b"\x01" * 32
+    assert tree.levels == MerkleTree(expected).levels
+    assert tree.levels == MerkleTree.from_leaf_level(b"".join(expected)).levels
+
+
+@pytest.mark.parametrize("count", [1, 2, 5, 8, 13])
+def test_proofs_verify_against_root(count):
+    tree = MerkleTree(leaves(count))
+    for index, leaf in enumerate(leaves(count)):
+        assert MerkleTree.verify_proof(leaf, tree.proof(index), tree.root)
+        assert not MerkleTree.verify_proof(b"\x00" * 32, tree.proof(index), tree.root)
+
+
+def test_diff_returns_every_differing_leaf():
+    tree = MerkleTree(leaves(13))
+    other = tree.copy()
+    for index in (0, 6, 12):
+        other.update(index, b"\x02" * 32)
+    assert tree.diff(other) == [0, 6, 12]
+    assert tree.diff(tree.copy()) == []
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_inclusion_proof(tmp_path, storage):
+    ledger = tmp_path / "ledger.jsonl"
+    write_ledger(ledger, [7])
+    db = load(ledger, storage)
+
+    proof = db.get_inclusion_proof("P00003")
+    assert proof["index"] == 3
+    assert proof["root"] == db.get_merkle_root()
+    assert HashChainDB.verify_inclusion_proof(proof)
+    assert HashChainDB.verify_inclusion_proof(proof, db.chain[3])
+    assert not HashChainDB.verify_inclusion_proof(proof, db.chain[4])
+    assert db.get_inclusion_proof("нет такого") is None
+
+    forged = dict(proof, root="0" * 64)
+    assert not HashChainDB.verify_inclusion_proof(forged)
+
+    add_contracts(db, 2, 100)
+    proof = db.get_inclusion_proof("P00100")
+    assert HashChainDB.verify_inclusion_proof(proof, db.chain[proof["index"]])
+    db.close()
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_tampered_indices_after_edits_rehash_only_edits(tmp_path, storage):
+    ledger = tmp_path / "ledger.jsonl"
+    write_ledger(ledger, [40])
+    db = load(ledger, storage)
+    assert db.is_chain_valid() == (True, -1)
+
+    db.update_contract(10, "fio", "Взлом")
+    db.update_contract(33, "premium", 1.0)
+    hashes = METRICS.counters["hashes_computed"]
+    assert db.find_tampered_indices() == [10, 33]
+    assert METRICS.counters["hashes_computed"] - hashes == 2
+
+    assert db.is_chain_valid(full=True) == (False, 10)
+    db.update_contract(20, "agent", "Взлом")
+    assert db.find_tampered_indices() == [10, 20, 33]
+    db.update_contract(10, "fio", "Иванов И.И. 10")
+    assert db.find_tampered_indices() == [20, 33]
+    db.close()
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_tampered_indices_in_file(tmp_path, storage):
+    ledger = tmp_path / "ledger.jsonl"
+    write_ledger(ledger, [20])
+    rewrite_record(ledger, 4, fio="Взлом")
+    rewrite_record(ledger, 15, premium=1.0)
+
+    db = load(ledger, storage)
+    assert db.find_tampered_indices() == [4, 15]
+    assert db.is_chain_valid() == (False, 4)
+    db.close()
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from helpers import add_contracts, load, write_ledger
+from ledger import METRICS, HashChainDB, Histogram, main
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    METRICS.reset()
+    yield
+    METRICS.stop_profile()
+    METRICS.reset()
+
+
+def test_counters_and_timings_follow_operations(tmp_path):
+    ledger = tmp_path / "ledger.jsonl"
+    db = HashChainDB()
+    add_contracts(db, 3)
+    assert METRICS.counters["contracts_added"] == 3
+    assert METRICS.counters["hashes_computed"] >= 3
+
+    db.save_to_filepath(str(ledger))
+    assert METRICS.counters["contracts_saved"] == 3
+    load(ledger).is_chain_valid(full=True)
+    assert METRICS.counters["contracts_loaded"] == 3
+    snapshot = METRICS.snapshot()
+    for name in ("save", "load", "validation"):
+        assert snapshot["histograms"][f"{name}_seconds"]["count"] == 1
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram()
+    for seconds in (0.0005, 0.001, 0.2, 100.0):
+        histogram.observe(seconds)
+    buckets = dict(histogram.cumulative_buckets())
+    assert buckets["0.001"] == 2
+    assert buckets["0.1"] == 2
+    assert buckets["0.5"] == 3
+    assert buckets["60.0"] == 3
+    assert buckets["+Inf"] == 4
+    assert histogram.count == 4
+
+
+def test_exports():
+    add_contracts(HashChainDB(), 2)
+    data = json.loads(METRICS.to_json())
+    assert data["counters"]["contracts_added"] == 2
+    assert data["profiling"] is False
+
+    text = METRICS.to_prometheus()
+    assert "# TYPE insurance_ledger_contracts_added_total counter\n" in text
+    assert "insurance_ledger_contracts_added_total 2\n" in text
+    assert 'insurance_ledger_load_seconds_bucket{le="+Inf"} 0\n' in text
+    assert "insurance_ledger_load_seconds_count 0\n" in text
+    assert METRICS.export("prometheus") == text
+
+
+def test_profile_collects_timed_calls(tmp_path):
+    ledger = tmp_path / "ledger.jsonl"
+    write_ledger(ledger, [5])
+    METRICS.start_profile()
+    assert METRICS.is_profiling
+    load(ledger)
+    report = METRICS.stop_profile()
+    assert not METRICS.is_profiling
+    assert "load_from_filepath" in report
+    assert METRICS.stop_profile() == report
+
+
+@pytest.mark.parametrize("fmt, expected", [
+    ("json", '"contracts_loaded": 4'),
+    ("prometheus", "insurance_ledger_contracts_loaded_total 4"),
+])
+def test_metrics_flag(tmp_path, capsys, fmt, expected):
+    ledger = tmp_path / "ledger.jsonl"
+    write_ledger(ledger, [4])
+    METRICS.reset()
+
+    assert main(["--metrics", fmt, "verify", str(ledger)]) == 0
+    assert expected in capsys.readouterr().out
+
+
+def test_metrics_file_and_profile_flags(tmp_path, capsys):
+    ledger = tmp_path / "ledger.jsonl"
+    metrics_file = tmp_path / "metrics.json"
+    write_ledger(ledger, [4])
+    METRICS.reset()
+
+    assert main(["--metrics-file", str(metrics_file), "--profile", "verify", str(ledger)]) == 0
+    assert "load_from_filepath" in capsys.readouterr().err
+    data = json.loads(metrics_file.read_text(encoding='utf-8'))
+    assert data["counters"]["contracts_loaded"] == 4
+    assert data["histograms"]["validation_seconds"]["count"] == 1
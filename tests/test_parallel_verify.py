@@ -0,0 +1,33 @@
+import pytest
+
+from helpers import STORAGES, load, make_segmented, rewrite_record, write_ledger
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+@pytest.mark.parametrize("index, key, value", [
+    (None, None, None),
+    (1, "fio", "Взлом"),
+    (17, "premium", 1.0),
+    (40, "agent", "Взлом"),
+    (23, "previous_hash", "0" * 64),
+])
+def test_parallel_matches_serial(tmp_path, storage, index, key, value):
+    ledger = tmp_path / "ledger.jsonl"
+    write_ledger(ledger, [20, 20])
+    db = load(ledger, storage)
+    if index is not None:
+        db.update_contract(index, key, value)
+
+    parallel = db.is_chain_valid_parallel(full=True, workers=2, chunk_size=7)
+    serial = db.is_chain_valid(full=True)
+    assert parallel == serial
+    assert serial == ((True, -1) if index is None else (False, index))
+    db.close()
+
+
+def test_parallel_matches_serial_on_segments(tmp_path):
+    directory = make_segmented(tmp_path)
+    rewrite_record(directory / "tail.jsonl", 3, fio="Взлом")
+    db = load(directory)
+
+    assert db.is_chain_valid_parallel(full=True, workers=2, chunk_size=7) == db.is_chain_valid(full=True) == (False, 23)
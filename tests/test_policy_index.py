@@ -0,0 +1,66 @@
+import pytest
+
+from helpers import STORAGES, add_contracts, load, rewrite_record, write_ledger
+from ledger import HashChainDB
+
+
+def test_index_follows_adds_and_renames():
+    db = HashChainDB()
+    add_contracts(db, 3)
+    assert db.get_contract_index_by_policy("P00002") == 2
+    assert not db.is_policy_number_unique("P00002")
+    assert db.is_policy_number_unique("P00004")
+    assert db.get_contract_by_policy("P00003").fio == "Иванов И.И. 3"
+    assert db.get_contract_by_policy("P00004") is None
+
+    db.update_contract(2, "policy_number", "NEW")
+    assert db.is_policy_number_unique("P00002")
+    assert db.get_contract_index_by_policy("NEW") == 2
+
+    db.update_contract(3, "fio", "Петров П.П.")
+    assert db.get_contract_index_by_policy("P00003") == 3
+
+
+def test_renaming_onto_a_taken_number_keeps_the_first_owner():
+    db = HashChainDB()
+    add_contracts(db, 3)
+    db.update_contract(3, "policy_number", "P00001")
+    assert db.get_contract_index_by_policy("P00001") == 1
+    assert db.is_policy_number_unique("P00003")
+
+    db.update_contract(1, "policy_number", "OTHER")
+    assert db.get_contract_index_by_policy("OTHER") == 1
+    assert db.get_contract_index_by_policy("P00001") == 3
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_duplicates_in_file_take_over_a_renamed_number(tmp_path, storage):
+    ledger = tmp_path / "ledger.jsonl"
+    write_ledger(ledger, [6])
+    rewrite_record(ledger, 2, policy_number="P00005")
+    rewrite_record(ledger, 4, policy_number="P00005")
+    db = load(ledger, storage)
+    assert db.get_contract_index_by_policy("P00005") == 2
+
+    db.update_contract(2, "policy_number", "NEW")
+    assert db.get_contract_index_by_policy("P00005") == 4
+    db.update_contract(4, "policy_number", "P00004")
+    assert db.get_contract_index_by_policy("P00005") == 5
+    db.update_contract(5, "policy_number", "OTHER")
+    assert db.is_policy_number_unique("P00005")
+    db.close()
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_index_is_rebuilt_on_load(tmp_path, storage):
+    ledger = tmp_path / "ledger.jsonl"
+    write_ledger(ledger, [4, 4])
+    db = load(ledger, storage)
+    assert db.get_policy_index() == {f"P{i:05d}": i for i in range(1, 9)}
+
+    add_contracts(db, 1, 100)
+    db.update_contract(5, "policy_number", "NEW")
+    assert db.get_contract_index_by_policy("P00100") == 9
+    assert db.get_contract_index_by_policy("NEW") == 5
+    assert db.is_policy_number_unique("P00005")
+    db.close()
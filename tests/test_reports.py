@@ -0,0 +1,79 @@
+import pytest
+
+from ledger import HashChainDB, main
+
+
+def make_db():
+    db = HashChainDB()
+    db.add_contract("Иванов И.И.", "P1", "", "Квартира", "Пожар", "01.01.2024", "31.12.2024", 100.0, 1000.0, "Петров П.П.")
+    db.add_contract("Смирнов С.С.", "P2", "", "Дом", "Затопление", "01.06.2024", "31.05.2025", 200.0, 5000.0, "Петров П.П.")
+    db.add_contract("Попов П.П.", "P3", "", "Квартира", "Пожар", "01.01.2025", "31.12.2025", 50.0, 800.0, "Иванов И.И.")
+    return db
+
+
+def brute_force_totals(db, dimension):
+    totals = {}
+    for contract in db.chain[1:]:
+        entry = totals.setdefault(getattr(contract, dimension), {"count": 0, "premium": 0.0, "coverage": 0.0})
+        entry["count"] += 1
+        entry["premium"] += contract.premium
+        entry["coverage"] += contract.coverage
+    return totals
+
+
+def test_totals_follow_adds_and_edits():
+    db = make_db()
+    assert db.totals_by("agent") == {
+        "Петров П.П.": {"count": 2, "premium": 300.0, "coverage": 6000.0},
+        "Иванов И.И.": {"count": 1, "premium": 50.0, "coverage": 800.0},
+    }
+
+    db.update_contract(1, "agent", "Иванов И.И.")
+    db.update_contract(2, "premium", 250.0)
+    db.update_contract(3, "risk", "Кража со взломом")
+    db.add_contract("Козлов К.К.", "P4", "", "Дача", "Пожар", "01.03.2025", "28.02.2026", 75.0, 900.0, "Кузнецов М.В.")
+
+    for dimension in ("agent", "risk", "object_insured"):
+        assert db.totals_by(dimension) == brute_force_totals(db, dimension)
+    assert db.find_contract_indices("risk", "Пожар") == [1, 4]
+    assert db.find_contract_indices("agent", "Петров П.П.") == [2]
+    assert db.get_reports().premium == 100.0 + 250.0 + 50.0 + 75.0
+
+
+def test_active_contracts_in_date_range():
+    db = make_db()
+    assert db.find_active_contract_indices("01.07.2024", "31.07.2024") == [1, 2]
+    assert db.find_active_contract_indices("01.01.2025") == [2, 3]
+    assert db.find_active_contract_indices(end_date="01.01.2024") == [1]
+    assert db.find_active_contract_indices() == [1, 2, 3]
+    assert db.find_active_contract_indices("01.01.2025", dimension="risk", value="Пожар") == [3]
+
+    db.update_contract(3, "start_date", "01.01.2026")
+    db.update_contract(3, "end_date", "31.12.2026")
+    assert db.find_active_contract_indices("01.01.2025", "31.12.2025") == [2]
+    assert db.active_totals_by("object_insured", "01.07.2024", "31.07.2024") == {
+        "Квартира": {"count": 1, "premium": 100.0, "coverage": 1000.0},
+        "Дом": {"count": 1, "premium": 200.0, "coverage": 5000.0},
+    }
+
+
+def test_bad_report_arguments_are_value_errors():
+    db = make_db()
+    with pytest.raises(ValueError):
+        db.find_active_contract_indices("2025-01-01")
+    with pytest.raises(ValueError):
+        db.totals_by("phone")
+    with pytest.raises(ValueError):
+        db.find_contract_indices("phone", "")
+    with pytest.raises(ValueError):
+        db.active_totals_by("phone", "01.01.2025")
+
+
+def test_stats_command_rejects_bad_date(tmp_path, capsys):
+    ledger = tmp_path / "ledger.jsonl"
+    make_db().save_to_filepath(str(ledger))
+
+    assert main(["stats", str(ledger), "--by", "risk", "--start-date", "2025-01-01"]) == 1
+    assert "ДД.ММ.ГГГГ" in capsys.readouterr().err
+    assert main(["stats", str(ledger), "--by", "risk", "--start-date", "01.01.2025"]) == 0
+    assert "Пожар: 1 договоров" in capsys.readouterr().out
@@ -0,0 +1,126 @@
+import json
+
+import pytest
+
+from helpers import add_contracts, load, make_segmented, rewrite_record
+
+
+def test_segment_seal_and_reopen(tmp_path):
+    directory = make_segmented(tmp_path)
+    db = load(directory)
+    assert len(db.chain.segments) == 2
+    assert len(db.chain.tail) == 5
+    assert len(db.chain) == 26
+    assert db.is_chain_valid(full=True) == (True, -1)
+
+    add_contracts(db, 6, 100)
+    db.save_to_filepath(str(directory))
+    db.save_checkpoint(str(directory))
+    assert len(db.chain.segments) == 3
+
+    reopened = load(directory)
+    assert len(reopened.chain) == 32
+    assert reopened.verified_up_to == 31
+    assert reopened.is_chain_valid(full=True) == (True, -1)
+
+
+def test_edited_sealed_segment_is_detected(tmp_path):
+    directory = make_segmented(tmp_path)
+    rewrite_record(directory / "segment-000001.jsonl", 3, fio="Взлом")
+
+    db = load(directory)
+    assert db.verified_up_to == 0
+    is_valid, error_index = db.is_chain_valid(full=True)
+    assert not is_valid
+    assert 11 <= error_index <= 20
+    assert db.find_tampered_indices() == [13]
+
+
+def test_edited_tail_drops_checkpoint(tmp_path):
+    directory = make_segmented(tmp_path)
+    db = load(directory)
+    assert db.verified_up_to == 25
+
+    rewrite_record(directory / "tail.jsonl", 2, fio="Взлом")
+    db = load(directory)
+    assert db.verified_up_to == 0
+    assert db.is_chain_valid() == (False, 22)
+
+
+def test_broken_anchor_is_detected(tmp_path):
+    directory = make_segmented(tmp_path)
+    manifest_path = directory / "manifest.json"
+    manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+    manifest["segments"][1]["anchor"] = "0" * 64
+    manifest_path.write_text(json.dumps(manifest), encoding='utf-8')
+
+    db = load(directory)
+    assert db.is_chain_valid(full=True) == (False, 11)
+
+
+def test_corrupted_tail_is_an_error(tmp_path):
+    directory = make_segmented(tmp_path)
+    tail_path = directory / "tail.jsonl"
+    lines = tail_path.read_bytes().split(b"\n")
+    lines[2] = lines[2][:-1]
+    tail_path.write_bytes(b"\n".join(lines))
+
+    with pytest.raises(ValueError):
+        load(directory)
+
+
+def cut_line(filepath, line_index, count=3):
+    lines = filepath.read_bytes().split(b"\n")
+    lines[line_index] = lines[line_index][:-count]
+    filepath.write_bytes(b"\n".join(lines))
+
+
+def test_damaged_sealed_segment_is_an_error(tmp_path):
+    directory = make_segmented(tmp_path)
+    segment_path = directory / "segment-000000.jsonl"
+    cut_line(segment_path, 4)
+    before = segment_path.read_bytes()
+
+    db = load(directory)
+    with pytest.raises(ValueError):
+        db.chain[2]
+    with pytest.raises(ValueError):
+        db.update_contract(2, "fio", "Взлом")
+    with pytest.raises(ValueError):
+        db.is_chain_valid(full=True)
+    assert segment_path.read_bytes() == before
+
+
+def test_short_sealed_segment_is_an_error(tmp_path):
+    directory = make_segmented(tmp_path)
+    segment_path = directory / "segment-000000.jsonl"
+    lines = segment_path.read_bytes().split(b"\n")
+    segment_path.write_bytes(b"\n".join(lines[:5]) + b"\n")
+    before = segment_path.read_bytes()
+
+    db = load(directory)
+    with pytest.raises(ValueError):
+        db.update_contract(2, "fio", "Взлом")
+    db.update_contract(15, "fio", "Взлом")
+    db.save_to_filepath(str(directory))
+    assert segment_path.read_bytes() == before
+    assert load(directory).chain[15].fio == "Взлом"
+
+
+def test_policy_index_follows_sealed_edits(tmp_path):
+    directory = make_segmented(tmp_path)
+    db = load(directory)
+    db.get_policy_index()
+    db.update_contract(15, "policy_number", "NEW")
+    rebuilt = load(directory)
+    rebuilt.update_contract(15, "policy_number", "NEW")
+
+    for checked in (db, rebuilt):
+        assert checked.is_policy_number_unique("P00015")
+        assert checked.get_contract_index_by_policy("NEW") == 15
+        assert checked.get_contract_index_by_policy("P00014") == 14
+
+    db.save_to_filepath(str(directory))
+    reopened = load(directory)
+    assert reopened.is_policy_number_unique("P00015")
+    assert reopened.get_contract_index_by_policy("NEW") == 15